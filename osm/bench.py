@@ -0,0 +1,136 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+from oblivion_save import *
+from oblivion_synth import SynthConfig, write_synthetic_save
+from ose import text_dump
+
+BENCH_VERSION = 1
+
+# Best of `repeat` runs of `fn`, in seconds.
+def best_time(fn, repeat):
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+#   Decode time per change record type, from a lazy load so that each type's subrecords are
+# decoded by themselves.
+def decode_times(filename, repeat):
+    records_by_type = {}
+
+    for record in OblivionSave(filename, lazy=True).change_records:
+        records_by_type.setdefault(cr_type_names.get(record.cr_type, str(record.cr_type)), []).append(record)
+
+    return {
+        name: best_time(lambda: [record.decode_subrecords() for record in records], repeat)
+        for name, records in sorted(records_by_type.items())
+    }
+
+def dump_time(filename, repeat):
+    save = OblivionSave(filename)
+
+    def dump():
+        with contextlib.redirect_stdout(io.StringIO()):
+            text_dump(save)
+
+    return best_time(dump, repeat)
+
+def run_scale(config, scale, directory, repeat):
+    config = config.scaled(scale)
+    filename = os.path.join(directory, f"synthetic_{config.records_num}_{config.form_ids_num}_"
+                                       f"{config.screenshot_width}x{config.screenshot_height}_{config.seed}.ess")
+
+    if not os.path.exists(filename):
+        write_synthetic_save(filename, config)
+
+    # Writes the snapshot the timed loads reuse.
+    OblivionSave(filename, snapshot=True)
+
+    return {
+        "scale": scale,
+        "records_num": config.records_num,
+        "file_size": os.path.getsize(filename),
+        "load": best_time(lambda: OblivionSave(filename), repeat),
+        "load_lazy": best_time(lambda: OblivionSave(filename, lazy=True), repeat),
+        "load_file_backend": best_time(lambda: OblivionSave(filename, backend="file"), repeat),
+        "load_snapshot": best_time(lambda: OblivionSave(filename, snapshot=True), repeat),
+        "decode_by_type": decode_times(filename, repeat),
+        "dump": dump_time(filename, repeat),
+    }
+
+#   Prints each timing of `results` next to the same timing in `baseline` (an earlier output file) and
+# the ratio between them.
+def compare(results, baseline):
+    baseline_by_scale = {result["scale"]: result for result in baseline["results"]}
+
+    for result in results["results"]:
+        before = baseline_by_scale.get(result["scale"])
+
+        if before is None:
+            continue
+
+        keys = ("load", "load_lazy", "load_file_backend", "load_snapshot", "dump")
+        timings = [(key, before.get(key), result[key]) for key in keys]
+        timings += [
+            (f"decode.{name}", before.get("decode_by_type", {}).get(name), seconds)
+            for name, seconds in result["decode_by_type"].items()
+        ]
+
+        for key, old, new in timings:
+            if old:
+                print(f"{result['scale']:>5}x {key:<24}{old:>10.4f}{new:>10.4f}{new/old:>8.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loading, decoding and dumping synthetic saves")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--records", type=int, default=SynthConfig.records_num, help="records at 1x")
+    parser.add_argument("--screenshot", type=int, nargs=2, default=None, metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--form-ids", type=int, default=SynthConfig.form_ids_num, help="form IDs at 1x")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dir", default="bench_saves", help="where the synthetic saves are kept")
+    parser.add_argument("--output", default="bench.json")
+    parser.add_argument("--compare", default=None, help="earlier output to compare against")
+
+    args = parser.parse_args()
+    config = SynthConfig(records_num=args.records, form_ids_num=args.form_ids, seed=args.seed)
+
+    if args.screenshot:
+        config.screenshot_width, config.screenshot_height = args.screenshot
+
+    os.makedirs(args.dir, exist_ok=True)
+    results = {
+        "version": BENCH_VERSION,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version,
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": [],
+    }
+
+    for scale in args.scales:
+        result = run_scale(config, scale, args.dir, args.repeat)
+        results["results"].append(result)
+        print(f"{scale:>5}x {result['records_num']:>8} records  load {result['load']:.4f}s  "
+              f"lazy {result['load_lazy']:.4f}s  snapshot {result['load_snapshot']:.4f}s  dump {result['dump']:.4f}s", flush=True)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            compare(results, json.load(file))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import json
+import os
+import struct
+from dataclasses import asdict, dataclass
+
+from oblivion_save_reader import OblivionSaveReader
+
+
+CATALOG_VERSION = 1
+CATALOG_FILENAME = ".osm_catalog.json"
+
+@dataclass
+class SaveSummary:
+    path: str
+    mtime_ns: int
+    size: int
+    save_num: int
+    pc_name: str
+    pc_level: int
+    pc_cell_name: str
+    game_days: float
+    records_num: int
+    form_ids_num: int
+    plugins: list[str]
+
+#   Builds a `SaveSummary` from the headers, the plugin list and the first fields of the globals.
+# The form ID count is read by jumping straight to `form_ids_offset`, so the change records are
+# never touched.
+def read_save_summary(path):
+    stat = os.stat(path)
+    reader = OblivionSaveReader(path)
+
+    try:
+        reader.read_file_header()
+        save_header = reader.read_save_header(skip_screenshot=True)
+        plugins = reader.read_plugins()
+        form_ids_offset = reader.read_u32()
+        records_num = reader.read_u32()
+        form_ids_num = reader.read_u32(offset=form_ids_offset)
+    finally:
+        reader.close()
+
+    return SaveSummary(
+        path, stat.st_mtime_ns, stat.st_size, save_header.save_num,
+        save_header.pc_name.decode("utf-8", errors="replace"), save_header.pc_level,
+        save_header.pc_cell_name.decode("utf-8", errors="replace"), save_header.game_days,
+        records_num, form_ids_num, [p.decode("utf-8", errors="replace") for p in plugins]
+    )
+
+#   Indexes a Saves directory.  Summaries are kept in an on-disk JSON cache keyed by path, and an
+# entry is reused on rescan as long as the file's mtime and size have not changed.
+class SaveCatalog:
+    def __init__(self, directory, cache_path=None, extension=".ess"):
+        self.directory = directory
+        self.cache_path = cache_path or os.path.join(directory, CATALOG_FILENAME)
+        self.extension = extension
+        self.summaries: dict[str, SaveSummary] = self.load_cache()
+        # Files that could not be read on the last scan, mapped to the error message.
+        self.errors: dict[str, str] = {}
+
+    def load_cache(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+        if cache.get("version") != CATALOG_VERSION:
+            return {}
+
+        return {path: SaveSummary(**entry) for path, entry in cache["entries"].items()}
+
+    def save_cache(self):
+        cache = {
+            "version": CATALOG_VERSION,
+            "entries": {path: asdict(summary) for path, summary in self.summaries.items()},
+        }
+        tmp_path = self.cache_path + ".tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(cache, file)
+
+        os.replace(tmp_path, self.cache_path)
+
+    #   Rescans the directory, re-reading only new or changed files and dropping entries for files
+    # that are gone.  Returns the number of files that had to be re-read.
+    def scan(self):
+        summaries: dict[str, SaveSummary] = {}
+        self.errors = {}
+        reread = 0
+
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.lower().endswith(self.extension):
+                    continue
+
+                stat = entry.stat()
+                cached = self.summaries.get(entry.path)
+
+                if cached and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+                    summaries[entry.path] = cached
+                    continue
+
+                try:
+                    summaries[entry.path] = read_save_summary(entry.path)
+                    reread += 1
+                except (OSError, struct.error, ValueError) as e:
+                    self.errors[entry.path] = str(e)
+
+        changed = reread or summaries.keys() != self.summaries.keys()
+        self.summaries = summaries
+
+        if changed:
+            self.save_cache()
+
+        return reread
+
+    def __iter__(self):
+        return iter(sorted(self.summaries.values(), key=lambda summary: summary.path))
+
+    def __len__(self):
+        return len(self.summaries)
+
+    def __str__(self):
+        return f"SaveCatalog({self.directory}, saves: {len(self.summaries)})"
+
+    def __repr__(self):
+        return self.__str__()
@@ -0,0 +1,82 @@
+import logging
+
+logger = logging.getLogger("osm")
+
+# How many offsets are kept per (kind, type) by default.
+MAX_SAMPLES = 8
+
+#   Counts what the parser came across but could not decode, instead of printing it: change
+# records of a type without a decoder, unknown change record, subrecord and field record types,
+# and compressed data.  Each entry is keyed by (kind, type) and keeps the number of occurrences,
+# the bytes they cover and the file offsets of the first `max_samples` of them.
+#   With `log` set every occurrence is also sent to the "osm" logger.
+class Diagnostics:
+    def __init__(self, log=False, max_samples=MAX_SAMPLES):
+        self.log = log
+        self.max_samples = max_samples
+        self.counts: dict[tuple, int] = {}
+        self.sizes: dict[tuple, int] = {}
+        self.samples: dict[tuple, list[int]] = {}
+
+    def report(self, kind, _type, size=0, offset=None):
+        key = (kind, _type)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.sizes[key] = self.sizes.get(key, 0) + size
+
+        if offset is not None:
+            samples = self.samples.setdefault(key, [])
+
+            if len(samples) < self.max_samples:
+                samples.append(offset)
+
+        if self.log:
+            logger.log(
+                logging.WARNING if kind.startswith("unknown") else logging.INFO,
+                "%s %s: %d bytes at offset %s", kind, _type, size, offset
+            )
+
+    #   Adds `count` occurrences covering `size` bytes in one go, e.g. from a table of record headers,
+    # with `offsets` the file offsets of the first of them.
+    def report_many(self, kind, _type, count, size, offsets=()):
+        key = (kind, _type)
+        self.counts[key] = self.counts.get(key, 0) + count
+        self.sizes[key] = self.sizes.get(key, 0) + size
+        samples = self.samples.setdefault(key, [])
+        samples += offsets[:self.max_samples - len(samples)]
+
+        if self.log:
+            logger.log(
+                logging.WARNING if kind.startswith("unknown") else logging.INFO,
+                "%s %s: %d occurrences, %d bytes", kind, _type, count, size
+            )
+
+    def count(self, kind, _type=None):
+        if _type is not None:
+            return self.counts.get((kind, _type), 0)
+
+        return sum(count for (k, _), count in self.counts.items() if k == kind)
+
+    # Entries of one kind as {type: (count, bytes)}.
+    def of_kind(self, kind):
+        return {t: (count, self.sizes[(k, t)]) for (k, t), count in self.counts.items() if k == kind}
+
+    # JSON-friendly form, keyed by "<kind>:<type>".
+    def as_dict(self):
+        return {
+            f"{kind}:{_type}": {
+                "count": count, "bytes": self.sizes[(kind, _type)], "offsets": self.samples.get((kind, _type), [])
+            }
+            for (kind, _type), count in self.counts.items()
+        }
+
+    def __bool__(self):
+        return bool(self.counts)
+
+    def __str__(self):
+        return "Diagnostics(" + ", ".join(
+            f"{kind} {_type}: {count} ({self.sizes[(kind, _type)]} bytes)"
+            for (kind, _type), count in sorted(self.counts.items(), key=str)
+        ) + ")"
+
+    def __repr__(self):
+        return self.__str__()
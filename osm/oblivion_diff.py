@@ -0,0 +1,156 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from oblivion_types import *
+from oblivion_save import OblivionSave
+
+@dataclass
+class RecordDiff:
+    form_id: int
+    cr_type: int
+    # field name -> (old, new)
+    header: dict[str, tuple] = field(default_factory=dict)
+    # "<subrecord index>.<field name>" -> (old, new)
+    fields: dict[str, tuple] = field(default_factory=dict)
+
+    def __str__(self):
+        return f"RecordDiff({hex(self.form_id)} {cr_type_names.get(self.cr_type, self.cr_type)}, " \
+               f"header: {self.header}, fields: {self.fields})"
+
+    def __repr__(self):
+        return self.__str__()
+
+@dataclass
+class SaveDiff:
+    added: list[ChangeRecord] = field(default_factory=list)
+    removed: list[ChangeRecord] = field(default_factory=list)
+    changed: list[RecordDiff] = field(default_factory=list)
+    # form_id -> (old, new), None where one side doesn't have the entry
+    global_vars: dict[int, tuple] = field(default_factory=dict)
+    death_counts: dict[int, tuple] = field(default_factory=dict)
+    regions: dict[int, tuple] = field(default_factory=dict)
+    pc_location: tuple | None = None
+    form_ids_added: list[int] = field(default_factory=list)
+    form_ids_removed: list[int] = field(default_factory=list)
+    # Number of FormIds slots, among those both saves have, that hold a different form ID.
+    form_ids_moved: int = 0
+    plugins_added: list[bytes] = field(default_factory=list)
+    plugins_removed: list[bytes] = field(default_factory=list)
+    plugins_reordered: bool = False
+
+    @property
+    def is_empty(self):
+        return not (
+            self.added or self.removed or self.changed or self.global_vars or self.death_counts or
+            self.regions or self.pc_location or self.form_ids_added or self.form_ids_removed or
+            self.form_ids_moved or self.plugins_added or self.plugins_removed or self.plugins_reordered
+        )
+
+    def __str__(self):
+        return f"SaveDiff(added: {len(self.added)}, removed: {len(self.removed)}, " \
+               f"changed: {len(self.changed)}, global_vars: {len(self.global_vars)}, " \
+               f"death_counts: {len(self.death_counts)}, regions: {len(self.regions)}, " \
+               f"pc_location: {self.pc_location}, form_ids: +{len(self.form_ids_added)} " \
+               f"-{len(self.form_ids_removed)} ~{self.form_ids_moved}, " \
+               f"plugins: +{len(self.plugins_added)} -{len(self.plugins_removed)})"
+
+    def __repr__(self):
+        return self.__str__()
+
+#   Diffs two saves.  Change records are matched by `cr_form_id` and compared on their raw header
+# and data first; only records whose bytes differ get their subrecords decoded and compared field
+# by field.  Saves loaded with `lazy=True` therefore only ever decode the records that changed.
+# When both saves were loaded with `fingerprints=True` the fingerprints are compared instead.
+def diff_saves(old: OblivionSave, new: OblivionSave):
+    diff = SaveDiff()
+    old_records = records_by_form_id(old)
+    new_records = records_by_form_id(new)
+
+    if old.record_fingerprints is not None and new.record_fingerprints is not None:
+        _, _, changed = old.record_fingerprints.diff(new.record_fingerprints)
+        diff.removed = [record for form_id, record in old_records.items() if form_id not in new_records]
+        diff.changed = [diff_records(old_records[form_id], new_records[form_id]) for form_id in changed.tolist()]
+    else:
+        for form_id, old_record in old_records.items():
+            new_record = new_records.get(form_id)
+
+            if new_record is None:
+                diff.removed.append(old_record)
+            elif not same_record_bytes(old_record, new_record):
+                diff.changed.append(diff_records(old_record, new_record))
+
+    diff.added = [record for form_id, record in new_records.items() if form_id not in old_records]
+
+    diff.global_vars = diff_mappings(old.globals.global_vars, new.globals.global_vars)
+    diff.death_counts = diff_mappings(old.globals.death_counts, new.globals.death_counts)
+    diff.regions = diff_mappings(
+        ArrayMapping(np.asarray(old.globals.regions_data, region_dtype)),
+        ArrayMapping(np.asarray(new.globals.regions_data, region_dtype))
+    )
+
+    if old.globals.pc_location != new.globals.pc_location:
+        diff.pc_location = (old.globals.pc_location, new.globals.pc_location)
+
+    old_ids = np.asarray(old.form_ids.ids, form_id_dtype)
+    new_ids = np.asarray(new.form_ids.ids, form_id_dtype)
+
+    if not np.array_equal(old_ids, new_ids):
+        diff.form_ids_added = np.setdiff1d(new_ids, old_ids).tolist()
+        diff.form_ids_removed = np.setdiff1d(old_ids, new_ids).tolist()
+        common = min(len(old_ids), len(new_ids))
+        diff.form_ids_moved = int(np.count_nonzero(old_ids[:common] != new_ids[:common]))
+
+    diff.plugins_added = [plugin for plugin in new.plugins if plugin not in old.plugins]
+    diff.plugins_removed = [plugin for plugin in old.plugins if plugin not in new.plugins]
+    common_plugins = [plugin for plugin in old.plugins if plugin in new.plugins]
+    diff.plugins_reordered = common_plugins != [plugin for plugin in new.plugins if plugin in old.plugins]
+
+    return diff
+
+def diff_files(old_filename, new_filename):
+    return diff_saves(OblivionSave(old_filename, lazy=True), OblivionSave(new_filename, lazy=True))
+
+def records_by_form_id(save):
+    if save.index is not None:
+        return save.index.by_form_id
+
+    return {record.cr_form_id: record for record in save.change_records}
+
+def same_record_bytes(old, new):
+    return old.cr_type == new.cr_type and old.cr_flags == new.cr_flags and \
+           old.version == new.version and old.data_size == new.data_size and old.data == new.data
+
+def diff_records(old, new):
+    diff = RecordDiff(new.cr_form_id, new.cr_type)
+
+    for name in ("cr_type", "cr_flags", "version", "data_size"):
+        if getattr(old, name) != getattr(new, name):
+            diff.header[name] = (getattr(old, name), getattr(new, name))
+
+    old_subrecords = old.subrecords
+    new_subrecords = new.subrecords
+
+    for i in range(max(len(old_subrecords), len(new_subrecords))):
+        old_fields = subrecord_fields(old_subrecords[i]) if i < len(old_subrecords) else {}
+        new_fields = subrecord_fields(new_subrecords[i]) if i < len(new_subrecords) else {}
+
+        for name in old_fields.keys() | new_fields.keys():
+            if old_fields.get(name) != new_fields.get(name):
+                diff.fields[f"{i}.{name}"] = (old_fields.get(name), new_fields.get(name))
+
+    return diff
+
+# Decoded fields of a subrecord, without the raw data it was decoded from.
+def subrecord_fields(subrecord):
+    return dict(decoded_fields(subrecord))
+
+def diff_mappings(old, new):
+    old = dict(old.items())
+    new = dict(new.items())
+
+    return {
+        key: (old.get(key), new.get(key))
+        for key in old.keys() | new.keys()
+        if old.get(key) != new.get(key)
+    }
@@ -0,0 +1,293 @@
+from collections.abc import Sequence
+
+import numpy as np
+
+from oblivion_types import *
+
+
+#   Lookup tables over a save's change records, built once after load so that finding the player's
+# ACHR (0x14), the NPC_ record (0x7) or every QUST record doesn't need a linear scan.
+#   `by_flag` is keyed by the flag mask (e.g. 0x80000000), the same way the subrecord decoders test
+# `cr_flags`.
+class ChangeRecordIndex:
+    def __init__(self, change_records, form_ids=None):
+        self.form_ids = form_ids
+        self.by_form_id: dict[int, ChangeRecord] = {}
+        self.by_type: dict[int, list[ChangeRecord]] = {}
+        self.by_flag: dict[int, list[ChangeRecord]] = {}
+
+        for record in change_records:
+            self.add(record)
+
+    def add(self, record):
+        self.by_form_id.setdefault(record.cr_form_id, record)
+        self.by_type.setdefault(record.cr_type, []).append(record)
+
+        flags = record.cr_flags
+
+        while flags:
+            flag = flags & -flags
+            self.by_flag.setdefault(flag, []).append(record)
+            flags ^= flag
+
+    def get(self, form_id, default=None):
+        return self.by_form_id.get(form_id, default)
+
+    # `cr_type` is either the numeric type or its name from `cr_type_names`, e.g. "QUST".
+    def of_type(self, cr_type):
+        if isinstance(cr_type, str):
+            cr_type = cr_type_ids[cr_type]
+
+        return self.by_type.get(cr_type, [])
+
+    def with_flag(self, flag):
+        return self.by_flag.get(flag, [])
+
+    # Maps an iref, an index into the save's FormIds table, to the form ID it refers to.
+    def resolve_iref(self, iref):
+        if self.form_ids is None:
+            raise ValueError("No FormIds table to resolve irefs against")
+
+        return int(self.form_ids.ids[iref])
+
+    def get_by_iref(self, iref, default=None):
+        return self.get(self.resolve_iref(iref), default)
+
+    def __contains__(self, form_id):
+        return form_id in self.by_form_id
+
+    def __len__(self):
+        return len(self.by_form_id)
+
+fingerprint_dtype = np.dtype("<u8")
+
+#   Content fingerprints of a save's change records: the 8-byte blake2b digest of each record's
+# header and data, computed while the records are read and kept in an array parallel to their form
+# IDs.  Fingerprints can be compared across saves without keeping or re-reading the record data.
+class RecordFingerprints:
+    def __init__(self, form_ids, fingerprints):
+        self.form_ids = form_ids
+        self.fingerprints = fingerprints
+        self._order = None
+
+    # `digests` is the bytearray filled in by `OblivionSaveReader.read_change_records`.
+    @classmethod
+    def from_records(cls, change_records, digests):
+        form_ids = np.fromiter(
+            (record.cr_form_id for record in change_records), form_id_dtype, len(change_records)
+        )
+
+        return cls(form_ids, np.frombuffer(digests, fingerprint_dtype))
+
+    def get(self, form_id, default=None):
+        if self._order is None:
+            self._order = np.argsort(self.form_ids, kind="stable")
+
+        i = np.searchsorted(self.form_ids, form_id, sorter=self._order)
+
+        if i < len(self._order) and self.form_ids[self._order[i]] == form_id:
+            return int(self.fingerprints[self._order[i]])
+
+        return default
+
+    #   Compares against the fingerprints of another save.  Returns the form IDs that were added,
+    # removed and whose record changed, as sorted arrays.
+    def diff(self, other):
+        common, self_indices, other_indices = np.intersect1d(
+            self.form_ids, other.form_ids, return_indices=True
+        )
+        changed = common[self.fingerprints[self_indices] != other.fingerprints[other_indices]]
+        added = np.setdiff1d(other.form_ids, self.form_ids)
+        removed = np.setdiff1d(self.form_ids, other.form_ids)
+
+        return added, removed, changed
+
+    def __len__(self):
+        return len(self.form_ids)
+
+# The 12-byte change record header exactly as it is laid out in the file.
+record_header_dtype = np.dtype(
+    [("form_id", "<u4"), ("cr_type", "u1"), ("cr_flags", "<u4"), ("version", "u1"), ("data_size", "<u2")]
+)
+
+#   Change record headers as a table of columns, one row per record, in the order of
+# `OblivionSave.change_records`, so that questions about many records are answered with array
+# operations instead of loops over `ChangeRecord` objects:
+#
+#     table.select(change_records, table.mask("REFR", flags=0x00000004))   # moved REFRs
+#     table.bytes_by_type()
+#     table.mask(plugin=3)
+#
+#   On the buffered backends the headers are gathered straight from the file buffer at the record
+# offsets.
+class RecordHeaderTable:
+    def __init__(self, headers, offsets):
+        self.headers = headers
+        self.offsets = offsets
+
+    @classmethod
+    def from_buffer(cls, buffer, offsets):
+        offsets = np.asarray(offsets, np.int64)
+        raw = np.frombuffer(buffer, np.uint8)
+        rows = raw[offsets[:, None] + np.arange(record_header_dtype.itemsize)]
+
+        return cls(rows.view(record_header_dtype).reshape(len(offsets)), offsets)
+
+    @classmethod
+    def from_records(cls, change_records):
+        headers = np.fromiter(
+            ((r.cr_form_id, r.cr_type, r.cr_flags, r.version, r.data_size) for r in change_records),
+            record_header_dtype, len(change_records)
+        )
+        offsets = np.fromiter(
+            (-1 if r.offset is None else r.offset for r in change_records), np.int64, len(change_records)
+        )
+
+        return cls(headers, offsets)
+
+    @property
+    def form_id(self): return self.headers["form_id"]
+    @property
+    def cr_type(self): return self.headers["cr_type"]
+    @property
+    def cr_flags(self): return self.headers["cr_flags"]
+    @property
+    def version(self): return self.headers["version"]
+    @property
+    def data_size(self): return self.headers["data_size"]
+
+    # Load order index of the plugin each form ID comes from.
+    @property
+    def plugin(self):
+        return self.form_id >> 24
+
+    #   Boolean mask of the rows matching every given condition.  `cr_type` is numeric or a name from
+    # `cr_type_names`; `flags` matches rows that have all of the given flag bits set.
+    def mask(self, cr_type=None, flags=None, plugin=None):
+        mask = np.ones(len(self), bool)
+
+        if cr_type is not None:
+            mask &= self.cr_type == (cr_type_ids[cr_type] if isinstance(cr_type, str) else cr_type)
+        if flags is not None:
+            mask &= (self.cr_flags & flags) == flags
+        if plugin is not None:
+            mask &= self.plugin == plugin
+
+        return mask
+
+    # The change records for the rows of `mask`, a boolean mask or an array of row indices.
+    def select(self, change_records, mask):
+        indices = np.flatnonzero(mask) if mask.dtype == bool else mask
+
+        return [change_records[i] for i in indices.tolist()]
+
+    # {cr_type: count} and {cr_type: bytes of data} over all rows.
+    def count_by_type(self):
+        counts = np.bincount(self.cr_type, minlength=256)
+
+        return {int(t): int(counts[t]) for t in np.flatnonzero(counts)}
+
+    def bytes_by_type(self):
+        sizes = np.bincount(self.cr_type, self.data_size, minlength=256)
+        counts = np.bincount(self.cr_type, minlength=256)
+
+        return {int(t): int(sizes[t]) for t in np.flatnonzero(counts)}
+
+    def __len__(self):
+        return len(self.headers)
+
+# Where a change record is in the save file, see `FormIdIndex`.
+form_id_index_dtype = np.dtype([("form_id", "<u4"), ("offset", "<u8"), ("data_size", "<u2"), ("cr_type", "u1")])
+
+#   The file offset, data size and type of each change record, sorted by form ID so that a record is
+# found with a binary search, e.g. to read it by itself with `OblivionSave.read_change_record`.  For
+# a form ID that occurs more than once the first record is kept, as in `ChangeRecordIndex`.
+class FormIdIndex:
+    def __init__(self, entries):
+        self.entries = entries
+
+    @classmethod
+    def from_headers(cls, headers):
+        if (headers.offsets < 0).any():
+            raise ValueError("Every change record needs a file offset to be indexed")
+
+        order = np.argsort(headers.form_id, kind="stable")
+        form_ids = headers.form_id[order]
+        first = np.ones(len(order), bool)
+        first[1:] = form_ids[1:] != form_ids[:-1]
+        order = order[first]
+
+        entries = np.empty(len(order), form_id_index_dtype)
+        entries["form_id"] = headers.form_id[order]
+        entries["offset"] = headers.offsets[order]
+        entries["data_size"] = headers.data_size[order]
+        entries["cr_type"] = headers.cr_type[order]
+
+        return cls(entries)
+
+    # (offset, data_size, cr_type) of the record with `form_id`.
+    def get(self, form_id, default=None):
+        form_ids = self.entries["form_id"]
+        i = int(np.searchsorted(form_ids, form_id))
+
+        if i < len(form_ids) and form_ids[i] == form_id:
+            _, offset, data_size, cr_type = self.entries[i].item()
+            return offset, data_size, cr_type
+
+        return default
+
+    def __contains__(self, form_id):
+        return self.get(form_id) is not None
+
+    def __len__(self):
+        return len(self.entries)
+
+#   Change records built from a `RecordHeaderTable` of the records in `source`, the buffer of the
+# save they were read from, each one the first time it is accessed.  This is
+# `OblivionSave.change_records` when the save is reloaded from a snapshot, so that a load doesn't
+# create an object for every record up front.  `lazy` is passed on to the records.
+class ChangeRecordSequence(Sequence):
+    def __init__(self, record_headers, source, lazy=True):
+        self.record_headers = record_headers
+        self.source = source
+        self.lazy = lazy
+        self._records: list[ChangeRecord] = [None]*len(record_headers)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        record = self._records[i]
+
+        if record is None:
+            form_id, cr_type, cr_flags, version, data_size = self.record_headers.headers[i].item()
+            record = self._records[i] = ChangeRecord(
+                form_id, cr_type, cr_flags, version, data_size, None, int(self.record_headers.offsets[i]),
+                self.lazy, self.source
+            )
+
+        return record
+
+    # Iterating builds all the records that are still missing in one pass over the columns.
+    def __iter__(self):
+        if None in self._records:
+            columns = (
+                self.record_headers.form_id.tolist(), self.record_headers.cr_type.tolist(),
+                self.record_headers.cr_flags.tolist(), self.record_headers.version.tolist(),
+                self.record_headers.data_size.tolist(), self.record_headers.offsets.tolist()
+            )
+
+            for i, (form_id, cr_type, cr_flags, version, data_size, offset) in enumerate(zip(*columns)):
+                if self._records[i] is None:
+                    self._records[i] = ChangeRecord(
+                        form_id, cr_type, cr_flags, version, data_size, None, offset, self.lazy, self.source
+                    )
+
+        return iter(self._records)
+
+    def __len__(self):
+        return len(self._records)
+
+    # The records built so far, without building the rest.
+    def built_records(self):
+        return [record for record in self._records if record is not None]
@@ -0,0 +1,168 @@
+import json
+import math
+
+import numpy as np
+
+from oblivion_types import *
+from oblivion_save_reader import OblivionSaveReader
+
+# class -> tuple of (json key, attribute) pairs, filled in by `schema`.
+schemas: dict[type, tuple] = {}
+
+# The fields serialized for a record class, see `decoded_field_names`, with leading underscores dropped from the keys.
+def schema(cls):
+    fields = schemas.get(cls)
+
+    if fields is None:
+        fields = schemas[cls] = tuple((name.lstrip("_"), name) for name in decoded_field_names(cls))
+
+    return fields
+
+# {class name: [field names]} for every decoded record class, for tooling that consumes the output.
+def record_schemas():
+    classes = [ACRE, BOOK, CREA, FACT, INFO, KEYM, PACK, QUST, WEAP, ANAM, DATA, EFID, EFIT, ENAM, ENIT,
+               FULL, ICON, MODB, MODL, SCIT, SPIT]
+
+    return {cls.__name__: [key for key, _ in schema(cls)] for cls in classes}
+
+#   Converts a decoded value to plain JSON types.  Named tuples become objects, byte strings become
+# hex, and non-finite floats become None because JSON has no representation for them.
+def to_json(value):
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, tuple) and hasattr(value, "_fields"):
+        return {key: to_json(item) for key, item in zip(value._fields, value)}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): to_json(item) for key, item in value.items()}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    if isinstance(value, np.ndarray):
+        return to_json(value.tolist())
+    if isinstance(value, np.generic):
+        return to_json(value.item())
+    if hasattr(type(value), "__slots__"):
+        return record_to_json(value)
+
+    return str(value)
+
+def record_to_json(record):
+    obj = {"class": type(record).__name__}
+
+    for key, name in schema(type(record)):
+        obj[key] = to_json(getattr(record, name, None))
+
+    return obj
+
+def change_record_to_json(record, include_data=False):
+    obj = {
+        "kind": "change_record",
+        "form_id": record.cr_form_id,
+        "cr_type": cr_type_names.get(record.cr_type, record.cr_type),
+        "cr_flags": record.cr_flags,
+        "version": record.version,
+        "data_size": record.data_size,
+        "offset": record.offset,
+        "subrecords": [record_to_json(subrecord) for subrecord in record.subrecords],
+    }
+
+    if include_data:
+        obj["data"] = bytes(record.data).hex()
+
+    return obj
+
+def created_record_to_json(record):
+    return {
+        "kind": "created_record",
+        "record_type": decode_text(record.record_type),
+        "form_id": record.form_id,
+        "flags": record.flags,
+        "vc_info": record.vc_info,
+        "fields": [
+            {"type": decode_text(field._type), "size": field.size,
+             "record": record_to_json(field.record) if field.record is not None else None}
+            for field in record.fields
+        ],
+    }
+
+#   Streams a save as NDJSON: one object per line, each with a "kind", in file order.  The file is
+# read section by section and every change record is decoded, written and dropped before the next
+# one is read, so memory use doesn't grow with the number of records.  With `include_data` the raw
+# data of each change record is included as hex.  Returns the number of lines written.
+def write_ndjson(filename, file, include_data=False, backend="file", profiler=None):
+    reader = OblivionSaveReader(filename, backend, profiler=profiler)
+    section = reader.section
+    encoder = json.JSONEncoder(separators=(",", ":"), allow_nan=False)
+    lines = 0
+
+    def write(obj):
+        nonlocal lines
+        file.write(encoder.encode(obj))
+        file.write("\n")
+        lines += 1
+
+    try:
+        with section("file_header"):
+            file_header = reader.read_file_header()
+        write({
+            "kind": "file_header", "header": decode_text(file_header.header),
+            "major_version": file_header.major_version, "minor_version": file_header.minor_version,
+        })
+
+        with section("save_header"):
+            save_header = reader.read_save_header()
+        screenshot = save_header.screenshot
+        write({
+            "kind": "save_header", "header_version": save_header.header_version,
+            "save_num": save_header.save_num, "pc_name": decode_text(save_header.pc_name),
+            "pc_level": save_header.pc_level, "pc_cell_name": decode_text(save_header.pc_cell_name),
+            "game_days": to_json(save_header.game_days), "game_ticks": save_header.game_ticks,
+            "screenshot": {"width": screenshot.width, "height": screenshot.height, "offset": screenshot.offset},
+        })
+
+        with section("plugins"):
+            plugins = reader.read_plugins()
+        write({"kind": "plugins", "plugins": [decode_text(plugin) for plugin in plugins]})
+
+        with section("globals"):
+            globals = reader.read_globals()
+        write({
+            "kind": "globals", "records_num": globals.records_num, "next_object_id": globals.next_object_id,
+            "world_id": globals.world_id, "world_x": globals.world_x, "world_y": globals.world_y,
+            "pc_location": {
+                "cell": globals.pc_location.cell, "x": to_json(globals.pc_location.x),
+                "y": to_json(globals.pc_location.y), "z": to_json(globals.pc_location.z),
+            },
+            "global_vars": to_json(globals.global_vars.array.tolist()),
+            "death_counts": to_json(globals.death_counts.array.tolist()),
+            "game_time_seconds": to_json(globals.game_time_seconds),
+            "pc_combat_count": globals.pc_combat_count,
+            "quick_keys": globals.quick_keys_data,
+            "regions": to_json(globals.regions_data.tolist()),
+        })
+
+        for record in globals.created_records:
+            write(created_record_to_json(record))
+
+        with section("change_records"):
+            for record in reader.iter_change_records(globals.records_num, lazy=True):
+                write(change_record_to_json(record, include_data))
+
+        with section("temporary_effects"):
+            temporary_effects = reader.read_temporary_effects()
+        write({"kind": "temporary_effects", "size": temporary_effects.size})
+
+        with section("form_ids"):
+            form_ids = reader.read_form_ids()
+        write({"kind": "form_ids", "ids": form_ids.ids.tolist()})
+
+        with section("world_spaces"):
+            world_spaces = reader.read_world_spaces()
+        write({"kind": "world_spaces", "spaces": world_spaces.spaces.tolist()})
+    finally:
+        reader.close()
+
+    return lines
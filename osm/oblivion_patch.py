@@ -0,0 +1,142 @@
+import os
+import shutil
+import struct
+
+import numpy as np
+
+from oblivion_types import *
+from oblivion_index import ChangeRecordSequence
+
+#   Same-size edits to a loaded save.  Every edit is recorded as bytes at an absolute file offset,
+# worked out from the offsets noted while parsing (`ChangeRecord.offset`, the subrecords'
+# `field_offsets` and `ArrayMapping.offset`), and is applied to the in-memory save as well.  The
+# edits to a record's data are merged into one patch of its whole current data, so that a later
+# edit is never overwritten by an earlier one.
+#   `write` copies the source file and writes only those bytes into the copy (or into the source
+# itself with `in_place`).  Only when a record's size changed does it fall back to a full rewrite
+# with `OblivionSaveWriter`.
+class SavePatcher:
+    def __init__(self, save):
+        self.save = save
+        # absolute file offset -> bytes to write there
+        self.patches: dict[int, bytes] = {}
+        # Records whose data changed size, or that were never read from the file.
+        self.resized: list[ChangeRecord] = []
+
+    # `name` is a key of the subrecord's `field_offsets`, e.g. "value" or "quest_stages.2.flag".
+    def set_field(self, record, name, value, subrecord_index=0):
+        subrecord = record.subrecords[subrecord_index]
+
+        if name not in subrecord.field_offsets:
+            raise KeyError(f"{type(subrecord).__name__} {hex(record.cr_form_id)} has no field {name}")
+
+        offset, format = subrecord.field_offsets[name]
+        self.patch_record(record, offset, struct.pack(format, value))
+        set_field_path(subrecord, name, value)
+
+    #   Only for flags that do not change which subrecords are present, such as INFO's
+    # topic_once_said or PACK's never_run.
+    def set_flags(self, record, cr_flags):
+        if record.offset is not None:
+            self.patches[record.offset + 5] = struct.pack("<I", cr_flags)
+        else:
+            self.resized.append(record)
+
+        record.cr_flags = cr_flags
+        record.subrecords = None
+
+    def set_global(self, form_id, value):
+        global_vars = self.save.globals.global_vars
+        indices = np.flatnonzero(global_vars.keys_array() == form_id)
+
+        if not len(indices):
+            raise KeyError(f"No global variable {hex(form_id)}")
+
+        index = int(indices[0])
+        array = global_vars.array.copy()
+        array["value"][index] = value
+
+        if global_vars.offset is not None:
+            offset = global_vars.offset + index*global_var_dtype.itemsize + 4
+            self.patches[offset] = array[index:index+1]["value"].tobytes()
+
+        self.save.globals.global_vars = ArrayMapping(array, global_vars.offset)
+
+    def replace_data(self, record, data):
+        if len(data) == record.data_size:
+            self.patch_record(record, 0, bytes(data))
+            record.subrecords = None
+        else:
+            record.set_data(data)
+            self.resized.append(record)
+
+    def patch_record(self, record, offset, data):
+        buffer = bytearray(record.data)
+        buffer[offset:offset+len(data)] = data
+        record.data = bytes(buffer)
+        record.modified = True
+
+        if record.offset is None:
+            self.resized.append(record)
+        else:
+            self.patches[record.offset + 12] = record.data
+
+    @property
+    def needs_rewrite(self):
+        return bool(self.resized)
+
+    #   Writes the edits to `filename`, or to the file the save was read from when `in_place` is
+    # set.  `filename` may only be that file with `in_place`, so that the source isn't overwritten by
+    # accident.  Returns True if the edits were patched in, False if the save had to be rewritten,
+    # which isn't possible in place, see `OblivionSave.save`.
+    #   Like `OblivionSave.save`, raises ValueError if a decoded field was changed without going
+    # through the patcher.
+    def write(self, filename=None, in_place=False):
+        source = self.save.reader.filename
+
+        if in_place:
+            filename = source
+        elif filename is None:
+            raise ValueError("Either a filename or in_place is required")
+        elif os.path.exists(filename) and os.path.samefile(filename, source):
+            raise ValueError(f"{filename} is the file the save was read from; pass in_place=True to patch it")
+
+        change_records = self.save.change_records
+
+        if isinstance(change_records, ChangeRecordSequence):
+            change_records = change_records.built_records()
+
+        for record in change_records:
+            record.check_decoded_fields()
+
+        if self.needs_rewrite:
+            self.save.save(filename)
+            return False
+
+        if filename != source:
+            shutil.copyfile(source, filename)
+
+        with open(filename, "r+b") as file:
+            for offset in sorted(self.patches):
+                file.seek(offset)
+                file.write(self.patches[offset])
+
+        return True
+
+#   Sets a dotted field path such as "quest_stages.2.entry.completion_day" on a subrecord.  The
+# named tuples along the path are replaced rather than modified.
+def set_field_path(subrecord, name, value):
+    attribute, *keys = name.split(".")
+    setattr(subrecord, attribute, replace_path(getattr(subrecord, attribute), keys, value))
+
+def replace_path(target, keys, value):
+    if not keys:
+        return value
+
+    key, *keys = keys
+
+    if isinstance(target, list):
+        target[int(key)] = replace_path(target[int(key)], keys, value)
+        return target
+
+    return target._replace(**{key: replace_path(getattr(target, key), keys, value)})
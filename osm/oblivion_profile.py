@@ -0,0 +1,89 @@
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+
+@dataclass
+class SectionStats:
+    name: str
+    seconds: float = 0.0
+    # Bytes of the file the section covers, measured as the distance the reader moved.
+    bytes: int = 0
+    # Net number of memory blocks allocated while reading the section, i.e. roughly the number of
+    # objects it left behind.  For per-type entries, the number of records and subrecords.
+    objects: int = 0
+    # Number of times the section was entered, the number of records for per-type entries.
+    count: int = 0
+
+    @property
+    def throughput(self):
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+#   Wall time, bytes and objects per section of a save, filled in by `OblivionSave(profile=True)` and
+# its reader.  Change records are broken down by type as "change_records.<type name>"; nested
+# sections such as "save_header.screenshot" are included in their parent's totals.
+class LoadProfiler:
+    def __init__(self):
+        self.sections: dict[str, SectionStats] = {}
+
+    @contextmanager
+    def section(self, name, reader):
+        position = reader.position
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, reader.position - position,
+                     sys.getallocatedblocks() - blocks)
+
+    def add(self, name, seconds, size, objects, count=1):
+        stats = self.sections.get(name)
+
+        if stats is None:
+            stats = self.sections[name] = SectionStats(name)
+
+        stats.seconds += seconds
+        stats.bytes += size
+        stats.objects += objects
+        stats.count += count
+
+    # Top-level sections only, so that nested sections are not counted twice.
+    @property
+    def total_seconds(self):
+        return sum(stats.seconds for name, stats in self.sections.items() if "." not in name)
+
+    def as_dict(self):
+        return {name: asdict(stats) for name, stats in self.sections.items()}
+
+    #   Text table of every section in the order they were read, with the per-type change record
+    # entries sorted by time under their section.
+    def report(self):
+        total = self.total_seconds or 1.0
+        lines = [f"{'section':<32}{'seconds':>10}{'%':>7}{'bytes':>12}{'MB/s':>9}{'objects':>10}{'count':>9}"]
+        top_level = [stats for name, stats in self.sections.items() if "." not in name]
+
+        for stats in top_level:
+            nested = sorted(
+                (s for name, s in self.sections.items() if name.startswith(stats.name + ".")),
+                key=lambda s: s.seconds, reverse=True
+            )
+
+            for s in [stats, *nested]:
+                name = s.name if s is stats else "  " + s.name[len(stats.name)+1:]
+                lines.append(
+                    f"{name:<32}{s.seconds:>10.4f}{100*s.seconds/total:>7.1f}{s.bytes:>12}"
+                    f"{s.throughput/1e6:>9.1f}{s.objects:>10}{s.count:>9}"
+                )
+
+        lines.append(f"{'total':<32}{self.total_seconds:>10.4f}")
+
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.report()
+
+    def __repr__(self):
+        return f"LoadProfiler({len(self.sections)} sections)"
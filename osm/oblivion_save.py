@@ -1,25 +1,323 @@
+import gc
+import os
 import struct
 
 from oblivion_types import *
+from oblivion_diagnostics import Diagnostics
+from oblivion_profile import LoadProfiler
+from oblivion_index import ChangeRecordIndex, ChangeRecordSequence, FormIdIndex, RecordFingerprints, RecordHeaderTable
 from oblivion_save_reader import OblivionSaveReader
+from oblivion_snapshot import SaveSnapshot, read_form_id_index, read_snapshot, write_form_id_index, write_snapshot
+from oblivion_save_writer import OblivionSaveWriter
 
+# The sections that can be chosen with `OblivionSave(sections=...)`, in file order.
+loadable_sections = ("plugins", "globals", "change_records", "temporary_effects", "form_ids", "world_spaces")
+# The attribute each of `loadable_sections` is loaded into.
+section_attributes = dict(zip(loadable_sections, (
+    "plugins", "globals", "change_records", "temporary_effects", "form_ids", "worldspaces"
+)))
 
 class OblivionSave:
-    def __init__(self, filename):
-        self.reader = OblivionSaveReader(filename)
-        self.file_header: FileHeader = self.reader.read_file_header()
-        self.save_header: SaveHeader = self.reader.read_save_header()
-        self.plugins: list[bytes] = self.reader.read_plugins()
-        self.globals: Globals = self.reader.read_globals() 
-        records_num = self.globals.records_num
-        self.change_records: list[ChangeRecord] = self.reader.read_change_records(records_num)
-        self.temporary_effects = self.reader.read_temporary_effects()
-        self.form_ids = self.reader.read_form_ids()
-        self.worldspaces = self.reader.read_world_spaces()
+    #   With `lazy` set, change records keep only their header and a view of their data, and their
+    # subrecords are decoded on first access.  With `headers_only` set only `file_header` and
+    # `save_header` are read and the other sections are left as None.  With `workers` set the change
+    # records are decoded in parallel, see `OblivionSaveReader.read_change_records_parallel`; there is
+    # nothing to decode up front with `lazy`, so the two together raise ValueError.  With
+    # `fingerprints` set a content hash of every change record is kept in `record_fingerprints`.
+    #   Whatever could not be decoded is counted in `diagnostics`; `log_diagnostics` also sends it to
+    # the "osm" logger.  With `profile` set, `profiler` holds the time, bytes and objects spent on
+    # each section.
+    #   With `snapshot` set the parsed record headers are kept in a sidecar file next to the save,
+    # see `oblivion_snapshot`.  While the save is unchanged, later loads take the headers from it
+    # instead of reading every change record, and the records are only created as they are
+    # accessed, decoded according to `lazy`.  It needs one of the buffered backends, and can't be
+    # combined with `fingerprints`, which need every record read, or with `sections`.
+    #   With `sections`, names from `loadable_sections`, only those sections are read besides the
+    # headers, e.g. `sections=("globals", "form_ids")`; see `load_sections`.
+    #   With `form_id_index` set, once the change records are read their offsets are written to an
+    # index file next to the save, unless it already has one that is up to date.  `read_change_record`
+    # uses it to read a single record.
+    def __init__(self, filename, backend="mmap", lazy=False, headers_only=False, skip_screenshot=False,
+                 workers=None, fingerprints=False, log_diagnostics=False, profile=False, snapshot=False,
+                 sections=None, form_id_index=False):
+        if workers and lazy:
+            raise ValueError("workers decode the change records in parallel and can't be combined with lazy")
+        if snapshot and backend == "file":
+            raise ValueError("Snapshots need the mmap or memory backend")
+        if snapshot and fingerprints:
+            raise ValueError("Snapshots can't be combined with fingerprints, which need every record read")
+        if snapshot and sections is not None:
+            raise ValueError("Snapshots can't be combined with sections")
+        if sections is not None and not set(sections) <= set(loadable_sections):
+            raise ValueError(f"Unknown sections: {', '.join(sorted(set(sections) - set(loadable_sections)))}")
 
+        self.diagnostics = Diagnostics(log_diagnostics)
+        self.profiler: LoadProfiler = LoadProfiler() if profile else None
+        self.reader = OblivionSaveReader(filename, backend, self.diagnostics, self.profiler)
+        self.plugins: list[bytes] = None
+        self.globals: Globals = None
+        self.change_records: list[ChangeRecord] = None
+        self.temporary_effects: TemporaryEffects = None
+        self.form_ids: FormIds = None
+        self.worldspaces: WorldSpaces = None
+        self.record_fingerprints: RecordFingerprints = None
+        self.section_offsets: dict[str, int] = self.reader.section_offsets
+        self._index: ChangeRecordIndex = None
+        self._record_headers: RecordHeaderTable = None
 
+        #   A save holds tens of thousands of records and the buffered backends hand each of them a
+        # memoryview, so the cyclic GC would otherwise keep rescanning the half-built record list.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+
+        section = self.reader.section
+
+        try:
+            with section("file_header"):
+                self.file_header: FileHeader = self.reader.read_file_header()
+            with section("save_header"):
+                self.save_header: SaveHeader = self.reader.read_save_header(skip_screenshot)
+
+            if headers_only:
+                self.reader.close()
+                return
+
+            save_snapshot = None
+
+            if snapshot:
+                with section("snapshot"):
+                    save_snapshot = read_snapshot(filename, self.reader.buffer)
+
+            if sections is not None:
+                self.load_sections(sections, lazy, workers, fingerprints)
+            elif save_snapshot is not None:
+                self.load_snapshot(save_snapshot, lazy)
+            else:
+                self.load_all(lazy, workers, fingerprints)
+
+                if snapshot:
+                    save_snapshot = SaveSnapshot(dict(self.section_offsets), self.record_headers)
+                    write_snapshot(filename, self.reader.buffer, save_snapshot)
+
+            if form_id_index and self.change_records is not None and read_form_id_index(filename) is None:
+                write_form_id_index(filename, FormIdIndex.from_headers(self.record_headers))
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def load_all(self, lazy, workers, fingerprints):
+        reader = self.reader
+        section = reader.section
+
+        with section("plugins"):
+            self.plugins = reader.read_plugins()
+        with section("globals"):
+            self.globals = reader.read_globals()
+
+        self.read_change_records(self.globals.records_num, lazy, workers, fingerprints)
+
+        with section("temporary_effects"):
+            self.temporary_effects = reader.read_temporary_effects()
+        with section("form_ids"):
+            self.form_ids = reader.read_form_ids()
+        with section("world_spaces"):
+            self.worldspaces = reader.read_world_spaces()
+        with section("index"):
+            self._index = ChangeRecordIndex(self.change_records, self.form_ids)
+
+    def read_change_records(self, records_num, lazy, workers, fingerprints):
+        digests = bytearray() if fingerprints else None
+
+        with self.reader.section("change_records"):
+            if workers:
+                self.change_records = self.reader.read_change_records_parallel(records_num, workers, digests)
+            else:
+                self.change_records = self.reader.read_change_records(records_num, lazy, digests)
+
+        if fingerprints:
+            self.record_fingerprints = RecordFingerprints.from_records(self.change_records, digests)
+
+    #   Reads only `sections` after the save header, jumping to each one from the offsets found by
+    # `OblivionSaveReader.read_section_offsets`; the others are left as None.  The change records
+    # are only walked over when the temporary effects, which follow them, are asked for.  The index
+    # is left to be built on first access.
+    def load_sections(self, sections, lazy, workers, fingerprints):
+        reader = self.reader
+        offsets = reader.read_section_offsets(temporary_effects="temporary_effects" in sections)
+
+        def seek(name):
+            reader.position = offsets[name]
+            return reader.section(name)
+
+        if "plugins" in sections:
+            with seek("plugins"):
+                self.plugins = reader.read_plugins()
+        if "globals" in sections:
+            with seek("globals"):
+                self.globals = reader.read_globals()
+        if "change_records" in sections:
+            # records_num is the second field of the globals.
+            records_num = reader.read_u32(offsets["globals"] + 4)
+            reader.position = offsets["change_records"]
+            self.read_change_records(records_num, lazy, workers, fingerprints)
+        if "temporary_effects" in sections:
+            with seek("temporary_effects"):
+                self.temporary_effects = reader.read_temporary_effects()
+        if "form_ids" in sections:
+            with seek("form_ids"):
+                self.form_ids = reader.read_form_ids()
+        if "world_spaces" in sections:
+            with seek("world_spaces"):
+                self.worldspaces = reader.read_world_spaces()
+
+    #   Reads the sections after the save header around the change records, which are taken from
+    # `snapshot` instead.  The index is left to be built on first access.
+    def load_snapshot(self, snapshot, lazy):
+        reader = self.reader
+        section = reader.section
+        reader.position = snapshot.section_offsets["plugins"]
+
+        with section("plugins"):
+            self.plugins = reader.read_plugins()
+        with section("globals"):
+            self.globals = reader.read_globals()
+        with section("change_records"):
+            self.change_records = ChangeRecordSequence(snapshot.record_headers, reader.buffer, lazy)
+            reader.report_change_records(snapshot.record_headers)
+            reader.position = snapshot.section_offsets["temporary_effects"]
+        with section("temporary_effects"):
+            self.temporary_effects = reader.read_temporary_effects()
+        with section("form_ids"):
+            self.form_ids = reader.read_form_ids()
+        with section("world_spaces"):
+            self.worldspaces = reader.read_world_spaces()
+
+        self._record_headers = snapshot.record_headers
+
+    @property
+    def index(self):
+        if self._index is None and self.change_records is not None:
+            self._index = ChangeRecordIndex(self.change_records, self.form_ids)
+
+        return self._index
+
+    @index.setter
+    def index(self, index):
+        self._index = index
+
+    #   Columnar table of the change record headers, built on first access.  It is a snapshot: set
+    # it to None after modifying records to have it rebuilt.
+    @property
+    def record_headers(self):
+        if self._record_headers is None and self.change_records is not None:
+            if self.reader.buffer is not None and all(r.offset is not None for r in self.change_records):
+                offsets = [record.offset for record in self.change_records]
+                self._record_headers = RecordHeaderTable.from_buffer(self.reader.buffer, offsets)
+            else:
+                self._record_headers = RecordHeaderTable.from_records(self.change_records)
+
+        return self._record_headers
+
+    @record_headers.setter
+    def record_headers(self, record_headers):
+        self._record_headers = record_headers
+
+    #   Reads only the file and save headers, which is all a save browser needs to list a directory.
+    # This costs one small read per file; the screenshot is only read if its pixels are asked for.
+    @classmethod
+    def read_headers(cls, filename, skip_screenshot=False):
+        return cls(filename, backend="file", headers_only=True, skip_screenshot=skip_screenshot)
+
+    #   Writes the save to `filename`.  Change records that were not modified are copied
+    # byte-for-byte from the source file, which is still open and often mapped, so `filename` can't
+    # be the file the save was read from; that, and a save that wasn't loaded in full (`sections`,
+    # `headers_only`), raise ValueError.
+    #   A change record is edited with `ChangeRecord.set_data` or through a `SavePatcher`; those are
+    # the only supported ways.  Its decoded subrecords are not encoded back, so assigning one of
+    # their fields (e.g. `record.subrecords[0].flags = 1`) makes this raise ValueError instead of
+    # losing the change.
+    def save(self, filename):
+        missing = [name for name, attribute in section_attributes.items() if getattr(self, attribute) is None]
+
+        if missing:
+            raise ValueError(f"Can't save {self.reader.filename} without its {', '.join(missing)}")
+        if os.path.exists(filename) and os.path.samefile(filename, self.reader.filename):
+            raise ValueError(f"Can't save over {filename}, the file the save was read from")
+
+        writer = OblivionSaveWriter(filename)
+        writer.write_save(self)
+        writer.close()
+
+    #   Reads the change record with `form_id` by itself, seeking straight to it through the form ID
+    # index next to the save, so that the time taken doesn't depend on the size of the save.  If the
+    # index is missing or out of date, the save is loaded lazily once to rebuild it.  Returns None if
+    # there is no record with that form ID.
+    @staticmethod
+    def read_change_record(filename, form_id, lazy=False, backend="file"):
+        index = read_form_id_index(filename)
+        rebuilt = index is None
+
+        if rebuilt:
+            index = OblivionSave.build_form_id_index(filename)
+
+        while True:
+            entry = index.get(form_id)
+
+            if entry is None:
+                return None
+
+            reader = OblivionSaveReader(filename, backend)
+
+            #   Only the header is read until the form ID matches, since a stale entry can point
+            # anywhere, even too close to the end of the file for a header.
+            try:
+                reader.position = entry[0]
+                record = next(reader.iter_change_records(1, lazy=True))
+            except struct.error:
+                record = None
+            finally:
+                reader.close()
+
+            if record is not None and record.cr_form_id == form_id:
+                if not lazy:
+                    record.subrecords = record.decode_subrecords()
+
+                return record
+            if rebuilt:
+                raise ValueError(f"Change record {hex(form_id)} is not where the form ID index of {filename} puts it")
+
+            # The index matched the save's size and mtime, but not its content.
+            index = OblivionSave.build_form_id_index(filename)
+            rebuilt = True
+
+    # Loads the save lazily to write its form ID index, replacing any existing one, and returns it.
+    @staticmethod
+    def build_form_id_index(filename):
+        index = FormIdIndex.from_headers(OblivionSave(filename, lazy=True).record_headers)
+        write_form_id_index(filename, index)
+
+        return index
+
+    #   Streams change records straight from the file without building the full record list.  Only
+    # the sections in front of the change records are parsed; see
+    # `OblivionSaveReader.iter_change_records` for `types` and `form_ids`.
+    @staticmethod
+    def iter_change_records(filename, types=None, form_ids=None, lazy=False, backend="file"):
+        reader = OblivionSaveReader(filename, backend)
+
+        try:
+            reader.read_file_header()
+            reader.read_save_header(skip_screenshot=True)
+            reader.read_plugins()
+            records_num = reader.read_globals().records_num
+
+            yield from reader.iter_change_records(records_num, types, form_ids, lazy)
+        finally:
+            reader.close()
+
+    # The reader is missing when the constructor failed before opening the file.
     def __del__(self):
-        del self.reader
+        self.__dict__.pop("reader", None)
 
     def __str__(self):
         return f"OblivionSave({self.reader.filename})"
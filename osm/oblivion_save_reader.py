@@ -1,25 +1,87 @@
+import hashlib
+import mmap
 import struct
+import sys
+import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
 
 from oblivion_types import *
 
+#   Reader backends.  "file" seeks and reads the file for every primitive, "mmap" maps the whole
+# file once and "memory" reads it into memory with a single call.  The last two decode straight
+# from a memoryview with `struct.unpack_from` and hand out views instead of copied bytes.
+READER_BACKENDS = ("file", "mmap", "memory")
+
+#   The sections of a save in file order, with the screenshot and the created records nested in the
+# section they are part of.  `OblivionSaveReader.section` records the offset each one starts at.
+save_sections = (
+    "file_header", "save_header", "save_header.screenshot", "plugins", "globals", "globals.created_records",
+    "change_records", "temporary_effects", "form_ids", "world_spaces",
+)
+
+#   Records and fields the reader cannot decode are counted in `diagnostics`, an
+# `oblivion_diagnostics.Diagnostics`, when one is given.  With a `profiler`, an
+# `oblivion_profile.LoadProfiler`, the screenshot, the created records and each change record are
+# timed as they are read.
 class OblivionSaveReader:
-    def __init__(self, filename):
+    def __init__(self, filename, backend="file", diagnostics=None, profiler=None):
+        if backend not in READER_BACKENDS:
+            raise ValueError(f"Unknown reader backend: {backend}")
+
         self.filename = filename
+        self.backend = backend
+        self.diagnostics = diagnostics
+        self.profiler = profiler
         self.position = 0
+        self.section_offsets: dict[str, int] = {}
         self.file = open(filename, "rb")
+        self.mmap = None
+        self.buffer = None
+
+        if backend == "mmap":
+            self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.buffer = memoryview(self.mmap)
+        elif backend == "memory":
+            self.buffer = memoryview(self.file.read())
 
     def __del__(self):
-        self.file.close()
+        self.close()
+
+    #   Also called from `__del__` when the constructor failed, e.g. because the file couldn't be
+    # opened, in which case there is no file to close.
+    def close(self):
+        # Views handed out by the buffered backends keep the mapping alive, so it is left to the
+        # garbage collector once the last of them is gone.
+        self.buffer = None
+        self.mmap = None
+        file = getattr(self, "file", None)
+
+        if file is not None:
+            file.close()
+
+    #   Times the reads in a `with` block as section `name` of the profiler, if there is one.  The
+    # offset the block starts at is kept in `section_offsets` for the sections in `save_sections`.
+    def section(self, name):
+        if name in save_sections:
+            self.section_offsets[name] = self.position
+
+        if self.profiler is None:
+            return nullcontext()
+
+        return self.profiler.section(name, self)
 
     def read_file_header(self):
-        header = self.read_bytes(12)
+        header = bytes(self.read_bytes(12))
         major_version = self.read_u8()
         minor_version = self.read_u8()
-        exe_time = self.read_bytes(16)
+        exe_time = bytes(self.read_bytes(16))
 
         return FileHeader(header, major_version, minor_version, exe_time)
 
-    def read_save_header(self):
+    def read_save_header(self, skip_screenshot=False):
         header_version = self.read_u32()
         save_header_size = self.read_u32()
         save_num = self.read_u32()
@@ -28,8 +90,10 @@ class OblivionSaveReader:
         pc_cell_name = self.read_bzstr()
         game_days = self.read_float()
         game_ticks = self.read_u32()
-        game_time = self.read_bytes(16)
-        screenshot = self.read_screenshot()
+        game_time = bytes(self.read_bytes(16))
+
+        with self.section("save_header.screenshot"):
+            screenshot = self.read_screenshot(skip=skip_screenshot)
 
         return SaveHeader(
             header_version, save_header_size, save_num, pc_name, pc_level,
@@ -56,43 +120,41 @@ class OblivionSaveReader:
             self.read_float()
         )
         globals_num = self.read_u16()
-        global_vars = {
-            self.read_u32(): self.read_float()
-            for _ in range(globals_num)
-        }
+        global_vars_offset = self.position
+        global_vars = ArrayMapping(self.read_array(global_var_dtype, globals_num), global_vars_offset)
         tes_class_size = self.read_u16()
         num_death_counts = self.read_u32()
-        death_counts = {
-            self.read_u32(): self.read_u16()
-            for _ in range(num_death_counts)
-        }
+        death_counts_offset = self.position
+        death_counts = ArrayMapping(self.read_array(death_count_dtype, num_death_counts), death_counts_offset)
         # Number of second spent in-game with no menus open.
         gametime_seconds = self.read_float()
         processes_size = self.read_u16()
         processes_data = self.read_bytes(processes_size)
         spec_event_size = self.read_u16()
-        spec_event_data = self.read_bytes(spec_event_size)
+        spec_event_data = bytes(self.read_bytes(spec_event_size))
         weather_size = self.read_u16()
-        weather_data = self.read_bytes(weather_size)
+        weather_data = bytes(self.read_bytes(weather_size))
         pc_combat_count = self.read_u32()
         # Created data, this includes spells, enchantments and potions created in-game.
         # The format is the same as the mod file record format.
         created_num = self.read_u32()
         created_records: list[CreatedRecord] = []
 
-        for _ in range(created_num):
-            cr_type = self.read_bytes(4)
-            cr_size = self.read_u32()
-            flags = self.read_u32()
-            form_id = self.read_u32()
-            vc_info = self.read_u32()
-            data = self.read_bytes(cr_size)
+        with self.section("globals.created_records"):
+            for _ in range(created_num):
+                cr_type = bytes(self.read_bytes(4))
+                cr_size = self.read_u32()
+                flags = self.read_u32()
+                form_id = self.read_u32()
+                vc_info = self.read_u32()
+                data_offset = self.position
+                data = self.read_bytes(cr_size)
 
-            cr = CreatedRecord(
-                cr_type, cr_size, flags, form_id, vc_info, data
-            )
+                cr = CreatedRecord(
+                    cr_type, cr_size, flags, form_id, vc_info, data, self.diagnostics, data_offset
+                )
 
-            created_records.append(cr)
+                created_records.append(cr)
 
         saved_pos = self.position
         #   Quick Keys settings. The size of individual data records can be 1 or 5 bytes, depending
@@ -112,14 +174,14 @@ class OblivionSaveReader:
 
         # Reticle data, not sure what this is yet.
         reticle_size = self.read_u16()
-        reticle_data = self.read_bytes(reticle_size)
+        reticle_data = bytes(self.read_bytes(reticle_size))
         # Interface stuff, not sure what this is yet.
         interface_size = self.read_u16()
-        interface_data = self.read_bytes(interface_size)
+        interface_data = bytes(self.read_bytes(interface_size))
         # Information about regions.
         regions_save = self.read_u16()
         regions_num = self.read_u16()
-        regions_data = [(self.read_u32(), self.read_u32()) for _ in range(regions_num)]
+        regions_data = self.read_array(region_dtype, regions_num)
 
         return Globals(
             form_ids_offset, records_num, next_object_id, world_id, world_x, world_y, pc_location,
@@ -129,22 +191,228 @@ class OblivionSaveReader:
             reticle_data, interface_size, interface_data, regions_save, regions_num, regions_data
         )
 
-    # Reads `records_num` change records from the file.  The `ChangeRecord` ctor processes subrecords.
-    def read_change_records(self, records_num):
+    #   Finds where each section in `save_sections` starts by reading only the sizes and counts
+    # that lead from one section to the next, and records the offsets in `section_offsets`.  The form
+    # IDs and world spaces are found through `form_ids_offset` without touching the change records.
+    # Only the temporary effects, which follow the change records, need the record headers walked,
+    # which is skipped unless `temporary_effects` is set.  The reader is left at an unspecified
+    # position.
+    def read_section_offsets(self, temporary_effects=True):
+        offsets = {"file_header": 0, "save_header": 30}
+
+        # header_version, then save_header_size counts everything after itself.
+        save_header_size = self.read_u32(34)
+        offsets["plugins"] = 38 + save_header_size
+        # save_num, pc_name, pc_level, pc_cell_name
+        self.position = 42
+        pc_name_size = self.read_u8()
+        self.position += pc_name_size + 2
+        pc_cell_name_size = self.read_u8()
+        # game_days, game_ticks, game_time
+        offsets["save_header.screenshot"] = self.position + pc_cell_name_size + 24
+
+        self.position = offsets["plugins"]
+
+        for _ in range(self.read_u8()):
+            plugin_size = self.read_u8()
+            self.position += plugin_size
+
+        offsets["globals"] = self.position
+        form_ids_offset = self.read_u32()
+        records_num = self.read_u32()
+        # next_object_id, world_id, world_x, world_y, pc_location
+        self.position += 32
+        globals_num = self.read_u16()
+        # global_vars, tes_class_size
+        self.position += global_var_dtype.itemsize*globals_num + 2
+        num_death_counts = self.read_u32()
+        # death_counts, game_time_seconds
+        self.position += death_count_dtype.itemsize*num_death_counts + 4
+
+        # processes, spec_event and weather data
+        for _ in range(3):
+            size = self.read_u16()
+            self.position += size
+
+        # pc_combat_count
+        self.position += 4
+        created_num = self.read_u32()
+        offsets["globals.created_records"] = self.position
+
+        for _ in range(created_num):
+            # type, size, then flags, form_id and vc_info
+            self.position += 4
+            size = self.read_u32()
+            self.position += 12 + size
+
+        # The quick keys size counts the size field itself.
+        quick_keys_size = self.read_u16()
+        self.position += quick_keys_size - 2
+
+        # reticle and interface data
+        for _ in range(2):
+            size = self.read_u16()
+            self.position += size
+
+        # regions_save
+        self.position += 2
+        regions_num = self.read_u16()
+        self.position += region_dtype.itemsize*regions_num
+        offsets["change_records"] = self.position
+
+        if temporary_effects:
+            self.scan_change_records(records_num)
+            offsets["temporary_effects"] = self.position
+
+        offsets["form_ids"] = form_ids_offset
+        offsets["world_spaces"] = form_ids_offset + 4 + form_id_dtype.itemsize*self.read_u32(form_ids_offset)
+
+        self.section_offsets.update((name, offsets[name]) for name in save_sections if name in offsets)
+
+        return self.section_offsets
+
+    #   Reads `records_num` change records from the file.  The `ChangeRecord` ctor processes subrecords,
+    # unless `lazy` is set, in which case they are decoded on first access.  See `iter_change_records`
+    # for `fingerprints`.
+    def read_change_records(self, records_num, lazy=False, fingerprints=None):
+        change_records: list[ChangeRecord] = list(
+            self.iter_change_records(records_num, lazy=lazy, fingerprints=fingerprints)
+        )
+
+        return change_records
+
+    #   Decodes the next `records_num` change records across `workers` processes, or threads on
+    # free-threaded builds.  A cheap boundary scan splits the section into ranges of records; each
+    # worker maps the file itself and decodes its ranges, and the results are merged in file order.
+    # `fingerprints` is filled in by the workers, as in `iter_change_records`.
+    def read_change_records_parallel(self, records_num, workers, fingerprints=None):
+        offsets = self.scan_change_records(records_num)
+        # A few ranges per worker so that one slow range doesn't hold up the others.
+        chunk_size = max(1, -(-records_num // (workers*4)))
+        ranges = [(offsets[i], min(chunk_size, records_num - i)) for i in range(0, records_num, chunk_size)]
+
+        if getattr(sys, "_is_gil_enabled", lambda: True)():
+            executor = ProcessPoolExecutor(workers)
+            copy = True
+        else:
+            executor = ThreadPoolExecutor(workers)
+            copy = False
+
         change_records: list[ChangeRecord] = []
 
+        with executor:
+            futures = [
+                executor.submit(
+                    read_change_record_range, self.filename, offset, count, copy, fingerprints is not None
+                )
+                for offset, count in ranges
+            ]
+
+            for future in futures:
+                records, digests = future.result()
+                change_records.extend(records)
+
+                if self.diagnostics is not None:
+                    for record in records:
+                        if record.cr_type not in decoded_cr_types:
+                            self.report_change_record(record.cr_type, record.data_size, record.offset)
+
+                if fingerprints is not None:
+                    fingerprints += digests
+
+        return change_records
+
+    #   Walks the next `records_num` change record headers without reading their data.  Returns the
+    # header offsets and leaves the reader at the end of the section.
+    def scan_change_records(self, records_num):
+        offsets: list[int] = []
+
         for _ in range(records_num):
-            form_id = self.read_u32()
-            _type = self.read_u8()
-            flags = self.read_u32()
-            version = self.read_u8()
+            offsets.append(self.position)
+            # data_size is the last field of the 12-byte header.
+            self.position += 10
             data_size = self.read_u16()
-            data = self.read_bytes(data_size)
+            self.position += data_size
+
+        return offsets
+
+    #   Yields the next `records_num` change records one at a time.  `types` (numeric or names from
+    # `cr_type_names`) and `form_ids` restrict which records are built; the bodies of the others are
+    # skipped using their `data_size` without being read.
+    #   If `fingerprints` is a bytearray, the 8-byte blake2b digest of each yielded record (header and
+    # data) is appended to it, see `RecordFingerprints`.
+    def iter_change_records(self, records_num, types=None, form_ids=None, lazy=False, fingerprints=None):
+        if types is not None:
+            types = {cr_type_ids[t] if isinstance(t, str) else t for t in types}
+        if form_ids is not None:
+            form_ids = set(form_ids)
+
+        profiler = self.profiler
+
+        for _ in range(records_num):
+            if profiler is not None:
+                start = time.perf_counter()
+
+            offset = self.position
+            # form_id: u32, type: u8, flags: u32, version: u8, data_size: u16
+            form_id, _type, flags, version, data_size = self.read_formatted("<IBIBH", 12, None)
+
+            if (types is not None and _type not in types) or (form_ids is not None and form_id not in form_ids):
+                self.position += data_size
+                continue
+
+            # The buffered backends leave the data in the buffer for the record to slice on access.
+            if self.buffer is not None:
+                data = None
+                self.position += data_size
+            else:
+                data = self.read_bytes(data_size)
+
+            if fingerprints is not None:
+                if self.buffer is not None:
+                    raw = self.buffer[offset:self.position]
+                else:
+                    raw = struct.pack("<IBIBH", form_id, _type, flags, version, data_size) + data
+                fingerprints += hashlib.blake2b(raw, digest_size=8).digest()
+
+            if self.diagnostics is not None and _type not in decoded_cr_types:
+                self.report_change_record(_type, data_size, offset)
+
             # Subrecord processing is done in the ChangeRecord ctor.
-            record = ChangeRecord(form_id, _type, flags, version, data_size, data)
-            change_records.append(record)
-        
-        return change_records
+            record = ChangeRecord(form_id, _type, flags, version, data_size, data, offset, lazy, self.buffer)
+
+            #   Counting allocated blocks walks every arena, which is too slow to do per record, so
+            # per-type entries count the record and its decoded subrecords as the objects created.
+            if profiler is not None:
+                profiler.add(
+                    "change_records." + cr_type_names.get(_type, str(_type)), time.perf_counter() - start,
+                    self.position - offset, 1 + len(record._subrecords or ())
+                )
+
+            yield record
+
+    def report_change_record(self, cr_type, data_size, offset):
+        if cr_type in cr_type_names:
+            self.diagnostics.report("unhandled_change_record", cr_type_names[cr_type], data_size, offset)
+        else:
+            self.diagnostics.report("unknown_change_record", cr_type, data_size, offset)
+
+    # The same as `report_change_record` for every row of a `RecordHeaderTable`.
+    def report_change_records(self, record_headers):
+        sizes = record_headers.bytes_by_type()
+
+        for cr_type, count in record_headers.count_by_type().items():
+            if cr_type in decoded_cr_types:
+                continue
+
+            offsets = record_headers.offsets[record_headers.cr_type == cr_type][:self.diagnostics.max_samples]
+
+            if cr_type in cr_type_names:
+                kind, _type = "unhandled_change_record", cr_type_names[cr_type]
+            else:
+                kind, _type = "unknown_change_record", cr_type
+
+            self.diagnostics.report_many(kind, _type, count, sizes[cr_type], offsets.tolist())
 
     def read_temporary_effects(self):
         temporary_effects_size = self.read_u32()
@@ -154,37 +422,53 @@ class OblivionSaveReader:
 
     def read_form_ids(self):
         form_ids_num = self.read_u32()
-        form_ids = [self.read_u32() for _ in range(form_ids_num)]
+        form_ids = self.read_array(form_id_dtype, form_ids_num)
 
         return FormIds(form_ids_num, form_ids)
 
     def read_world_spaces(self):
         world_spaces_num = self.read_u32()
-        world_spaces = [self.read_u32() for _ in range(world_spaces_num)]
+        world_spaces = self.read_array(form_id_dtype, world_spaces_num)
 
         return WorldSpaces(world_spaces_num, world_spaces)
 
+    #   An explicit `offset` moves the reader there first, on every backend, so that it ends up just
+    # past what was read either way.
     def read_formatted(self, format, length, offset):
-        if offset:
-            self.file.seek(offset)
-        else:
-            self.file.seek(self.position)
-        
+        if offset is not None:
+            self.position = offset
+
+        if self.buffer is not None:
+            values = struct.unpack_from(format, self.buffer, self.position)
+            self.position += length
+
+            return values
+
+        self.file.seek(self.position)
         raw = self.file.read(length)
         self.position += length
 
         return struct.unpack(format, raw)
     
     def read_bytes(self, length, offset=None):
-        if offset:
-            self.file.seek(offset)
+        if offset is not None:
             self.position = offset
-        else:
-            self.file.seek(self.position)
 
+        if self.buffer is not None:
+            view = self.buffer[self.position:self.position+length]
+            self.position += length
+
+            return view
+
+        self.file.seek(self.position)
         self.position += length
         return self.file.read(length)
     
+    #   Decodes `count` fixed-width items in one go.  On the buffered backends the array is a view
+    # of the file and nothing is copied.
+    def read_array(self, dtype, count, offset=None):
+        return np.frombuffer(self.read_bytes(dtype.itemsize*count, offset), dtype, count)
+
     def read_char(self, offset=None): return self.read_formatted("c", 1, offset)[0]
     def read_i8(self, offset=None): return int(self.read_formatted("b", 1, offset)[0])
     def read_u8(self, offset=None): return int(self.read_formatted("B", 1, offset)[0])
@@ -196,8 +480,8 @@ class OblivionSaveReader:
     def read_u64(self, offset=None): return int(self.read_formatted("Q", 8, offset)[0])
     def read_float(self, offset=None): return float(self.read_formatted("f", 4, offset)[0])
     def read_double(self, offset=None): return float(self.read_formatted("d", 8, offset)[0])
-    def read_bzstr(self, offset=None): return self.read_bytes(self.read_u8())[:-1]
-    def read_bstr(self, offset=None):  return self.read_bytes(self.read_u8())
+    def read_bzstr(self, offset=None): return bytes(self.read_bytes(self.read_u8())[:-1])
+    def read_bstr(self, offset=None):  return bytes(self.read_bytes(self.read_u8()))
 
     def read_zstr(self):
         chars = b""        
@@ -211,13 +495,44 @@ class OblivionSaveReader:
 
         return chars
     
-    def read_screenshot(self, offset=None):
+    #   The pixel data is seeked past and only loaded when asked for, see `Screenshot.load`.  With
+    # `skip` set the screenshot doesn't keep a reference to the file either and has no pixels.
+    def read_screenshot(self, offset=None, skip=False):
         size = self.read_u32()
         width = self.read_u32()
         height = self.read_u32()
-        data = self.read_bytes(3*width*height)
+        data_offset = self.position
+        self.position += 3*width*height
+
+        if skip:
+            source = None
+        elif self.buffer is not None:
+            source = self.buffer
+        else:
+            source = self.filename
 
-        return Screenshot(size, width, height, data)
+        return Screenshot(size, width, height, None, data_offset, source)
         
     # TODO: create class for timestamp and read it properly
     def read_timestamp(self, offset=None): return self.read_formatted("s", 16, pos)
+
+#   Worker for `OblivionSaveReader.read_change_records_parallel`: decodes `records_num` change records
+# starting at `offset`.  With `copy` set the record data is copied out of the mapping so that the
+# records can be pickled back to the parent process.  Returns the records and, with `fingerprints`
+# set, their digests.
+def read_change_record_range(filename, offset, records_num, copy, fingerprints=False):
+    reader = OblivionSaveReader(filename, "mmap")
+    reader.position = offset
+    change_records: list[ChangeRecord] = []
+    digests = bytearray() if fingerprints else None
+
+    for record in reader.iter_change_records(records_num, lazy=True, fingerprints=digests):
+        if copy:
+            record.data = bytes(record.data)
+
+        record._subrecords = record.decode_subrecords()
+        change_records.append(record)
+
+    reader.close()
+
+    return change_records, digests
@@ -0,0 +1,243 @@
+import os
+import struct
+from collections.abc import Mapping
+
+import numpy as np
+
+from oblivion_types import *
+
+# Byte strings at least this long are kept as separate chunks instead of being copied.
+PASSTHROUGH_SIZE = 4096
+
+#   Serializes an `OblivionSave` back to the .ess format, section by section, mirroring
+# `OblivionSaveReader`.  Output is collected as a list of chunks and written out in one go by
+# `close`.  Change records that were not modified are copied from the source buffer, with runs of
+# adjacent records coalesced into a single slice, so they are never re-encoded.
+class OblivionSaveWriter:
+    def __init__(self, filename):
+        self.filename = filename
+        self.position = 0
+        self.chunks: list = []
+        self.buffer = bytearray()
+        # (chunk, offset) of the form_ids_offset field, filled in by `write_form_ids`.
+        self.form_ids_offset_field = None
+
+    def write_save(self, save):
+        self.write_file_header(save.file_header)
+        self.write_save_header(save.save_header)
+        self.write_plugins(save.plugins)
+        self.write_globals(save.globals, len(save.change_records))
+        self.write_change_records(save.change_records, save.reader.buffer)
+        self.write_temporary_effects(save.temporary_effects)
+        self.write_form_ids(save.form_ids)
+        self.write_world_spaces(save.worldspaces)
+
+    def write_file_header(self, file_header):
+        self.write_bytes(file_header.header)
+        self.write_u8(file_header.major_version)
+        self.write_u8(file_header.minor_version)
+        self.write_bytes(file_header.exe_time)
+
+    def write_save_header(self, save_header):
+        screenshot = save_header.screenshot
+
+        if screenshot.load() is None:
+            raise ValueError("Cannot write a save header whose screenshot was skipped")
+
+        self.write_u32(save_header.header_version)
+        # save_header_size counts everything after itself, up to the end of the screenshot.
+        save_header_size = 4 + (len(save_header.pc_name) + 2) + 2 + \
+                           (len(save_header.pc_cell_name) + 2) + 4 + 4 + 16 + 12 + len(screenshot.data)
+        self.write_u32(save_header_size)
+        self.write_u32(save_header.save_num)
+        self.write_bzstr(save_header.pc_name)
+        self.write_u16(save_header.pc_level)
+        self.write_bzstr(save_header.pc_cell_name)
+        self.write_float(save_header.game_days)
+        self.write_u32(save_header.game_ticks)
+        self.write_bytes(save_header.game_time)
+        self.write_screenshot(screenshot)
+
+    def write_screenshot(self, screenshot):
+        self.write_u32(screenshot.size)
+        self.write_u32(screenshot.width)
+        self.write_u32(screenshot.height)
+        self.write_bytes(screenshot.data)
+
+    def write_plugins(self, plugins):
+        self.write_u8(len(plugins))
+
+        for plugin in plugins:
+            self.write_bstr(plugin)
+
+    #   Counts and sizes are recomputed from the data they describe.  `records_num` is passed in
+    # by the caller, and form_ids_offset is left as a placeholder until `write_form_ids`.
+    def write_globals(self, globals, records_num):
+        self.form_ids_offset_field = (self.buffer, len(self.buffer))
+        self.write_u32(0)
+        self.write_u32(records_num)
+        self.write_u32(globals.next_object_id)
+        self.write_u32(globals.world_id)
+        self.write_u32(globals.world_x)
+        self.write_u32(globals.world_y)
+        self.write_u32(globals.pc_location.cell)
+        self.write_float(globals.pc_location.x)
+        self.write_float(globals.pc_location.y)
+        self.write_float(globals.pc_location.z)
+        global_vars = as_array(globals.global_vars, global_var_dtype)
+        self.write_u16(len(global_vars))
+        self.write_array(global_vars)
+        self.write_u16(globals.tes_class_size)
+        death_counts = as_array(globals.death_counts, death_count_dtype)
+        self.write_u32(len(death_counts))
+        self.write_array(death_counts)
+        self.write_float(globals.game_time_seconds)
+        self.write_u16(len(globals.processes_data))
+        self.write_bytes(globals.processes_data)
+        self.write_u16(len(globals.spec_event_data))
+        self.write_bytes(globals.spec_event_data)
+        self.write_u16(len(globals.weather_data))
+        self.write_bytes(globals.weather_data)
+        self.write_u32(globals.pc_combat_count)
+        self.write_u32(len(globals.created_records))
+
+        for record in globals.created_records:
+            self.write_bytes(record.record_type)
+            self.write_u32(len(record.data))
+            self.write_u32(record.flags)
+            self.write_u32(record.form_id)
+            self.write_u32(record.vc_info)
+            self.write_bytes(record.data)
+
+        quick_keys_data = bytearray()
+        quick_keys = iter(globals.quick_keys_data)
+
+        for flag in quick_keys:
+            quick_keys_data.append(flag)
+
+            if flag:
+                quick_keys_data += struct.pack("<I", next(quick_keys))
+
+        # Like the reader, quick_keys_size is measured from the start of the size field itself.
+        self.write_u16(len(quick_keys_data) + 2)
+        self.write_bytes(quick_keys_data)
+        self.write_u16(len(globals.reticle_data))
+        self.write_bytes(globals.reticle_data)
+        self.write_u16(len(globals.interface_data))
+        self.write_bytes(globals.interface_data)
+        regions_data = as_array(globals.regions_data, region_dtype)
+        self.write_u16(globals.regions_size)
+        self.write_u16(len(regions_data))
+        self.write_array(regions_data)
+
+    #   Records that were not modified and still match their header in `source` are copied from it;
+    # the rest are encoded from their header fields and `data`.  Raises ValueError for a record whose
+    # decoded fields were assigned, see `ChangeRecord.changed_fields`.
+    def write_change_records(self, change_records, source=None):
+        run_start = run_end = None
+
+        for record in change_records:
+            record.check_decoded_fields()
+
+            if source is not None and is_passthrough(record, source):
+                if record.offset != run_end:
+                    if run_start is not None:
+                        self.write_bytes(source[run_start:run_end])
+                    run_start = record.offset
+
+                run_end = record.offset + 12 + record.data_size
+                continue
+
+            if run_start is not None:
+                self.write_bytes(source[run_start:run_end])
+                run_start = run_end = None
+
+            self.write_formatted(
+                "<IBIBH", 12,
+                record.cr_form_id, record.cr_type, record.cr_flags, record.version, len(record.data)
+            )
+            self.write_bytes(record.data)
+
+        if run_start is not None:
+            self.write_bytes(source[run_start:run_end])
+
+    def write_temporary_effects(self, temporary_effects):
+        self.write_u32(len(temporary_effects.data))
+        self.write_bytes(temporary_effects.data)
+
+    def write_form_ids(self, form_ids):
+        if self.form_ids_offset_field is not None:
+            chunk, offset = self.form_ids_offset_field
+            struct.pack_into("<I", chunk, offset, self.position)
+
+        ids = as_array(form_ids.ids, form_id_dtype)
+        self.write_u32(len(ids))
+        self.write_array(ids)
+
+    def write_world_spaces(self, world_spaces):
+        spaces = as_array(world_spaces.spaces, form_id_dtype)
+        self.write_u32(len(spaces))
+        self.write_array(spaces)
+
+    #   Writes the collected chunks to `filename`.  The output goes to a temporary file first so
+    # that a save can be written over the file it was read from.
+    def close(self):
+        self.flush_buffer()
+        tmp_filename = self.filename + ".tmp"
+
+        with open(tmp_filename, "wb") as file:
+            file.writelines(self.chunks)
+
+        os.replace(tmp_filename, self.filename)
+        self.chunks = []
+
+    def flush_buffer(self):
+        if self.buffer:
+            self.chunks.append(self.buffer)
+            self.buffer = bytearray()
+
+    def write_formatted(self, format, length, *values):
+        self.buffer += struct.pack(format, *values)
+        self.position += length
+
+    def write_bytes(self, data):
+        if len(data) >= PASSTHROUGH_SIZE:
+            self.flush_buffer()
+            self.chunks.append(data)
+        else:
+            self.buffer += data
+
+        self.position += len(data)
+
+    def write_array(self, array):
+        self.write_bytes(memoryview(np.ascontiguousarray(array).view(np.uint8)))
+
+    def write_u8(self, value): self.write_formatted("<B", 1, value)
+    def write_u16(self, value): self.write_formatted("<H", 2, value)
+    def write_u32(self, value): self.write_formatted("<I", 4, value)
+    def write_float(self, value): self.write_formatted("<f", 4, value)
+    def write_bzstr(self, value): self.write_bstr(bytes(value) + b"\x00")
+
+    def write_bstr(self, value):
+        self.write_u8(len(value))
+        self.write_bytes(value)
+
+# Converts an `ArrayMapping`, a plain mapping, a list or an array to an array of `dtype`.
+def as_array(value, dtype):
+    if isinstance(value, ArrayMapping):
+        value = value.array
+    elif isinstance(value, Mapping):
+        value = list(value.items())
+
+    if isinstance(value, np.ndarray) and value.dtype == dtype:
+        return value
+
+    return np.array(value, dtype=dtype)
+
+def is_passthrough(record, source):
+    if record.modified or record.offset is None or len(record.data) != record.data_size:
+        return False
+
+    header = struct.unpack_from("<IBIBH", source, record.offset)
+
+    return header == (record.cr_form_id, record.cr_type, record.cr_flags, record.version, record.data_size)
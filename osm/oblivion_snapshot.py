@@ -0,0 +1,170 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+
+import numpy as np
+
+from oblivion_index import FormIdIndex, RecordHeaderTable, form_id_index_dtype, record_header_dtype
+
+SNAPSHOT_MAGIC = b"OSMSNAP\0"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".osmcache"
+
+FORM_ID_INDEX_MAGIC = b"OSMFIDX\0"
+FORM_ID_INDEX_VERSION = 1
+FORM_ID_INDEX_SUFFIX = ".osmidx"
+
+# magic, version, save size, save mtime (ns), save digest, records_num, sections_num
+snapshot_header = struct.Struct("<8sIQq16sII")
+# section name, offset
+snapshot_section = struct.Struct("<32sQ")
+# magic, version, save size, save mtime (ns), entries_num
+form_id_index_header = struct.Struct("<8sIQqI")
+
+logger = logging.getLogger("osm")
+
+#   The parsed state of a save that is expensive to rebuild: the offset of every section and the
+# header and offset of every change record.  The other sections are a few hundred bytes each and are
+# decoded again from the mapped save, starting at their offsets.
+@dataclass
+class SaveSnapshot:
+    section_offsets: dict[str, int]
+    record_headers: RecordHeaderTable
+
+def snapshot_path(filename):
+    return filename + SNAPSHOT_SUFFIX
+
+def save_digest(buffer):
+    return hashlib.blake2b(buffer, digest_size=16).digest()
+
+#   The snapshot of the save `filename`, whose contents are `buffer`, or None when there is none or
+# it was written for a different size, mtime or content.  The snapshot file is memory-mapped and
+# the header table is a view of it.
+def read_snapshot(filename, buffer):
+    try:
+        stat = os.stat(filename)
+
+        with open(snapshot_path(filename), "rb") as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if not is_valid(mapping, stat, buffer):
+        #   Closed right away rather than left to the garbage collector, so that the file can be
+        # replaced with a new snapshot on Windows.
+        mapping.close()
+        return None
+
+    _, _, _, _, _, records_num, sections_num = snapshot_header.unpack_from(mapping)
+
+    offset = snapshot_header.size
+    section_offsets = {}
+
+    for _ in range(sections_num):
+        name, section_offset = snapshot_section.unpack_from(mapping, offset)
+        section_offsets[name.rstrip(b"\0").decode()] = section_offset
+        offset += snapshot_section.size
+
+    offset = aligned(offset)
+    headers = np.frombuffer(mapping, record_header_dtype, records_num, offset)
+    offset = aligned(offset + headers.nbytes)
+    offsets = np.frombuffer(mapping, np.int64, records_num, offset)
+
+    return SaveSnapshot(section_offsets, RecordHeaderTable(headers, offsets))
+
+# Writes the snapshot of the save `filename` next to it, see `write_sidecar`.
+def write_snapshot(filename, buffer, snapshot):
+    stat = os.stat(filename)
+    record_headers = snapshot.record_headers
+    path = snapshot_path(filename)
+
+    parts = [snapshot_header.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, stat.st_size, stat.st_mtime_ns, save_digest(buffer), len(record_headers),
+        len(snapshot.section_offsets)
+    )]
+    parts += [snapshot_section.pack(name.encode(), offset) for name, offset in snapshot.section_offsets.items()]
+    parts.append(padding(snapshot_header.size + snapshot_section.size*len(snapshot.section_offsets)))
+    parts.append(np.ascontiguousarray(record_headers.headers, record_header_dtype).tobytes())
+    parts.append(padding(record_headers.headers.nbytes))
+    parts.append(np.ascontiguousarray(record_headers.offsets, np.int64).tobytes())
+
+    write_sidecar(path, parts)
+
+def form_id_index_path(filename):
+    return filename + FORM_ID_INDEX_SUFFIX
+
+#   The form ID index of the save `filename`, or None when there is none or it was written for a
+# different size or mtime.  Unlike the snapshot the save is not hashed, so that a lookup costs the
+# same whatever the size of the save.  The entries are a view of the memory-mapped index file.
+def read_form_id_index(filename):
+    try:
+        stat = os.stat(filename)
+
+        with open(form_id_index_path(filename), "rb") as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    if len(mapping) >= form_id_index_header.size:
+        magic, version, size, mtime_ns, entries_num = form_id_index_header.unpack_from(mapping)
+        key = (FORM_ID_INDEX_MAGIC, FORM_ID_INDEX_VERSION, stat.st_size, stat.st_mtime_ns)
+
+        if (magic, version, size, mtime_ns) == key and \
+           len(mapping) == form_id_index_header.size + form_id_index_dtype.itemsize*entries_num:
+            entries = np.frombuffer(mapping, form_id_index_dtype, entries_num, form_id_index_header.size)
+            return FormIdIndex(entries)
+
+    # See `read_snapshot`.
+    mapping.close()
+    return None
+
+def write_form_id_index(filename, index):
+    stat = os.stat(filename)
+
+    write_sidecar(form_id_index_path(filename), [
+        form_id_index_header.pack(
+            FORM_ID_INDEX_MAGIC, FORM_ID_INDEX_VERSION, stat.st_size, stat.st_mtime_ns, len(index)
+        ),
+        np.ascontiguousarray(index.entries, form_id_index_dtype).tobytes(),
+    ])
+
+#   Writes a sidecar file under a temporary name and renames it into place, so that a reader never
+# sees half of it.  A file that can't be written, e.g. in a read-only directory, is only logged.
+def write_sidecar(path, parts):
+    temporary_path = path + ".tmp"
+
+    try:
+        with open(temporary_path, "wb") as file:
+            file.write(b"".join(parts))
+
+        os.replace(temporary_path, path)
+    except OSError as e:
+        logger.warning("Could not write %s: %s", path, e)
+
+# Cheap checks first: the save's content is only hashed when its size and mtime match.
+def is_valid(mapping, stat, buffer):
+    if len(mapping) < snapshot_header.size:
+        return False
+
+    magic, version, size, mtime_ns, digest, records_num, sections_num = snapshot_header.unpack_from(mapping)
+
+    return (
+        (magic, version, size, mtime_ns) == (SNAPSHOT_MAGIC, SNAPSHOT_VERSION, stat.st_size, stat.st_mtime_ns)
+        and len(mapping) == snapshot_size(records_num, sections_num)
+        and digest == save_digest(buffer)
+    )
+
+def aligned(offset):
+    return (offset + 7) & ~7
+
+def padding(offset):
+    return bytes(aligned(offset) - offset)
+
+def snapshot_size(records_num, sections_num):
+    offset = aligned(snapshot_header.size + snapshot_section.size*sections_num)
+    offset = aligned(offset + record_header_dtype.itemsize*records_num)
+
+    return offset + 8*records_num
@@ -0,0 +1,255 @@
+import os
+import sqlite3
+
+from oblivion_types import *
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS saves (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    save_num INTEGER,
+    pc_name TEXT,
+    pc_level INTEGER,
+    pc_cell_name TEXT,
+    game_days REAL,
+    game_ticks INTEGER,
+    records_num INTEGER,
+    form_ids_num INTEGER,
+    UNIQUE (path, mtime_ns, size)
+);
+CREATE TABLE IF NOT EXISTS plugins (
+    save_id INTEGER NOT NULL REFERENCES saves(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS global_vars (
+    save_id INTEGER NOT NULL REFERENCES saves(id) ON DELETE CASCADE,
+    form_id INTEGER NOT NULL,
+    value REAL
+);
+CREATE TABLE IF NOT EXISTS death_counts (
+    save_id INTEGER NOT NULL REFERENCES saves(id) ON DELETE CASCADE,
+    form_id INTEGER NOT NULL,
+    count INTEGER
+);
+CREATE TABLE IF NOT EXISTS created_records (
+    save_id INTEGER NOT NULL REFERENCES saves(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    record_type TEXT,
+    form_id INTEGER,
+    flags INTEGER,
+    size INTEGER
+);
+CREATE TABLE IF NOT EXISTS created_fields (
+    save_id INTEGER NOT NULL REFERENCES saves(id) ON DELETE CASCADE,
+    record_idx INTEGER NOT NULL,
+    field_idx INTEGER NOT NULL,
+    type TEXT,
+    name TEXT,
+    value
+);
+CREATE TABLE IF NOT EXISTS change_records (
+    save_id INTEGER NOT NULL REFERENCES saves(id) ON DELETE CASCADE,
+    form_id INTEGER NOT NULL,
+    cr_type INTEGER NOT NULL,
+    cr_flags INTEGER NOT NULL,
+    version INTEGER,
+    data_size INTEGER,
+    offset INTEGER
+);
+CREATE TABLE IF NOT EXISTS record_fields (
+    save_id INTEGER NOT NULL REFERENCES saves(id) ON DELETE CASCADE,
+    form_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value
+);
+CREATE TABLE IF NOT EXISTS quest_stages (
+    save_id INTEGER NOT NULL REFERENCES saves(id) ON DELETE CASCADE,
+    form_id INTEGER NOT NULL,
+    stage_index INTEGER NOT NULL,
+    flag INTEGER,
+    completion_day INTEGER,
+    completion_year INTEGER
+);
+CREATE INDEX IF NOT EXISTS plugins_save ON plugins (save_id);
+CREATE INDEX IF NOT EXISTS global_vars_form_id ON global_vars (form_id, save_id);
+CREATE INDEX IF NOT EXISTS death_counts_form_id ON death_counts (form_id, save_id);
+CREATE INDEX IF NOT EXISTS created_records_save ON created_records (save_id);
+CREATE INDEX IF NOT EXISTS created_fields_save ON created_fields (save_id, record_idx);
+CREATE INDEX IF NOT EXISTS change_records_form_id ON change_records (form_id, save_id);
+CREATE INDEX IF NOT EXISTS change_records_type ON change_records (cr_type, save_id);
+CREATE INDEX IF NOT EXISTS record_fields_form_id ON record_fields (form_id, name, save_id);
+CREATE INDEX IF NOT EXISTS quest_stages_form_id ON quest_stages (form_id, stage_index, save_id);
+"""
+
+#   Stores parsed saves in a local SQLite database so that questions across many saves run as
+# indexed queries.  Each save is a row of `saves`; the other tables reference it by `save_id`.
+# Decoded subrecord fields are flattened into `record_fields` under the same dotted names as
+# `field_offsets` (e.g. "base_data.level"), and quest stages get a table of their own.
+class SaveDatabase:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def find_save(self, path, mtime_ns, size):
+        row = self.connection.execute(
+            "SELECT id FROM saves WHERE path = ? AND mtime_ns = ? AND size = ?", (path, mtime_ns, size)
+        ).fetchone()
+
+        return row[0] if row else None
+
+    #   Adds a loaded save and returns its id.  A save already stored with the same path, mtime and
+    # size is not added again unless `replace` is set.  All rows are inserted in one transaction.
+    def add_save(self, save, replace=False):
+        path = os.path.abspath(save.reader.filename)
+        stat = os.stat(path)
+        save_id = self.find_save(path, stat.st_mtime_ns, stat.st_size)
+
+        if save_id is not None and not replace:
+            return save_id
+
+        header = save.save_header
+        rows = save_rows(save)
+
+        with self.connection:
+            if save_id is not None:
+                self.connection.execute("DELETE FROM saves WHERE id = ?", (save_id,))
+
+            save_id = self.connection.execute(
+                "INSERT INTO saves (path, mtime_ns, size, save_num, pc_name, pc_level, pc_cell_name, "
+                "game_days, game_ticks, records_num, form_ids_num) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, stat.st_mtime_ns, stat.st_size, header.save_num, decode_text(header.pc_name),
+                 header.pc_level, decode_text(header.pc_cell_name), header.game_days, header.game_ticks,
+                 len(save.change_records), len(save.form_ids.ids))
+            ).lastrowid
+
+            for table, columns, table_rows in rows:
+                placeholders = ", ".join("?"*(len(columns) + 1))
+                self.connection.executemany(
+                    f"INSERT INTO {table} (save_id, {', '.join(columns)}) VALUES ({placeholders})",
+                    ((save_id, *row) for row in table_rows)
+                )
+
+        return save_id
+
+    def query(self, sql, parameters=()):
+        return self.connection.execute(sql, parameters).fetchall()
+
+    # (path, game_days, flag) of every save in which the quest has reached `stage_index`.
+    def saves_with_quest_stage(self, form_id, stage_index):
+        return self.query(
+            "SELECT s.path, s.game_days, q.flag FROM quest_stages q JOIN saves s ON s.id = q.save_id "
+            "WHERE q.form_id = ? AND q.stage_index = ? ORDER BY s.game_days",
+            (form_id, stage_index)
+        )
+
+    # (path, game_days, count) of a death count across the stored saves, in game time order.
+    def death_counts_over_time(self, form_id):
+        return self.query(
+            "SELECT s.path, s.game_days, d.count FROM death_counts d JOIN saves s ON s.id = d.save_id "
+            "WHERE d.form_id = ? ORDER BY s.game_days",
+            (form_id,)
+        )
+
+    def __str__(self):
+        return f"SaveDatabase({self.path})"
+
+    def __repr__(self):
+        return self.__str__()
+
+#   Rows for every table but `saves`, as (table, columns, rows).  Lazily loaded records are decoded
+# here.
+def save_rows(save):
+    globals = save.globals
+    created_records = []
+    created_fields = []
+    change_records = []
+    record_fields = []
+    quest_stages = []
+
+    for i, record in enumerate(globals.created_records):
+        created_records.append(
+            (i, decode_text(record.record_type), record.form_id, record.flags, len(record.data))
+        )
+
+        for j, field_record in enumerate(record.fields):
+            field_type = decode_text(field_record._type)
+
+            if field_record.record is None:
+                created_fields.append((i, j, field_type, None, None))
+                continue
+
+            for name, value in flatten_fields(field_record.record):
+                created_fields.append((i, j, field_type, name, value))
+
+    for record in save.change_records:
+        change_records.append(
+            (record.cr_form_id, record.cr_type, record.cr_flags, record.version, record.data_size, record.offset)
+        )
+
+        for subrecord in record.subrecords:
+            if isinstance(subrecord, QUST) and subrecord.quest_stages:
+                for stage in subrecord.quest_stages:
+                    quest_stages.append((
+                        record.cr_form_id, stage.index, stage.flag,
+                        stage.entry.completion_day, stage.entry.completion_year
+                    ))
+
+            for name, value in flatten_fields(subrecord, {"quest_stages"}):
+                record_fields.append((record.cr_form_id, name, value))
+
+    return [
+        ("plugins", ("idx", "name"), [(i, decode_text(name)) for i, name in enumerate(save.plugins)]),
+        ("global_vars", ("form_id", "value"), globals.global_vars.items()),
+        ("death_counts", ("form_id", "count"), globals.death_counts.items()),
+        ("created_records", ("idx", "record_type", "form_id", "flags", "size"), created_records),
+        ("created_fields", ("record_idx", "field_idx", "type", "name", "value"), created_fields),
+        ("change_records", ("form_id", "cr_type", "cr_flags", "version", "data_size", "offset"), change_records),
+        ("record_fields", ("form_id", "name", "value"), record_fields),
+        ("quest_stages", ("form_id", "stage_index", "flag", "completion_day", "completion_year"), quest_stages),
+    ]
+
+#   Yields (dotted name, value) for the decoded fields of a slotted subrecord or field record, see
+# `decoded_fields`.  Named tuples, lists and dicts are flattened into their items; fields that were
+# not present (None) are left out.
+def flatten_fields(record, skip=()):
+    for name, value in decoded_fields(record):
+        if name not in skip:
+            yield from flatten_value(name.lstrip("_"), value)
+
+def flatten_value(name, value):
+    if value is None:
+        return
+    if isinstance(value, tuple) and hasattr(value, "_fields"):
+        for key, item in zip(value._fields, value):
+            yield from flatten_value(f"{name}.{key}", item)
+    elif isinstance(value, (list, tuple)):
+        for i, item in enumerate(value):
+            yield from flatten_value(f"{name}.{i}", item)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten_value(f"{name}.{key}", item)
+    elif isinstance(value, (bytes, memoryview)):
+        yield name, bytes(value)
+    else:
+        yield name, value
@@ -0,0 +1,259 @@
+import random
+import struct
+import zlib
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+
+from oblivion_types import *
+from oblivion_save_writer import OblivionSaveWriter
+
+# Relative weights of the change record types in a generated save, roughly those of a real one.
+DEFAULT_MIX = {
+    "REFR": 40, "ACHR": 10, "CELL": 10, "NPC_": 5, "CREA": 4, "ACRE": 4, "QUST": 5, "FACT": 3,
+    "BOOK": 3, "WEAP": 3, "KEYM": 2, "INFO": 6, "PACK": 4, "APPA": 1,
+}
+
+@dataclass
+class SynthConfig:
+    records_num: int = 1000
+    # change record type name -> relative weight
+    mix: dict[str, int] = field(default_factory=lambda: dict(DEFAULT_MIX))
+    created_num: int = 8
+    # Effects per created spell, each an EFID/EFIT pair.
+    effects_num: int = 2
+    # Store the created spells zlib-compressed, see `COMPRESSED_FLAG`.
+    compress_created: bool = False
+    screenshot_width: int = 256
+    screenshot_height: int = 192
+    form_ids_num: int = 5000
+    plugins: list[bytes] = field(default_factory=lambda: [b"Oblivion.esm", b"Knights.esp", b"DLCShiveringIsles.esp"])
+    seed: int = 0
+
+    # The same save with `factor` times the records, created records and form IDs.
+    def scaled(self, factor):
+        return replace(
+            self, records_num=self.records_num*factor, created_num=self.created_num*factor,
+            form_ids_num=self.form_ids_num*factor
+        )
+
+#   Writes a valid synthetic save to `filename` and returns the config it was built from.  Records
+# of the decoded types get data that matches their flags, so that every subrecord decodes; the
+# other types get random bytes.  The same config and seed always give the same file.
+def write_synthetic_save(filename, config=None):
+    config = config or SynthConfig()
+    rng = random.Random(config.seed)
+    writer = OblivionSaveWriter(filename)
+
+    writer.write_file_header(FileHeader(b"TES4SAVEGAME", 0, 125, bytes(16)))
+    writer.write_save_header(synthetic_save_header(rng, config))
+    writer.write_plugins(config.plugins)
+    change_records = synthetic_change_records(rng, config)
+    writer.write_globals(synthetic_globals(rng, config), len(change_records))
+    writer.write_change_records(change_records)
+    writer.write_temporary_effects(TemporaryEffects(16, rng.randbytes(16)))
+    writer.write_form_ids(FormIds(config.form_ids_num, np.arange(
+        0x00000100, 0x00000100 + config.form_ids_num, dtype=form_id_dtype
+    )))
+    writer.write_world_spaces(WorldSpaces(2, np.array([0x0000003C, 0x0001E85E], form_id_dtype)))
+    writer.close()
+
+    return config
+
+def synthetic_save_header(rng, config):
+    pixels = rng.randbytes(3*config.screenshot_width*config.screenshot_height)
+    screenshot = Screenshot(8 + len(pixels), config.screenshot_width, config.screenshot_height, pixels)
+
+    # save_header_size is recomputed by the writer.
+    return SaveHeader(125, 0, 1, b"Synthetic", 12, b"Imperial City", 3.5, 1234, bytes(16), screenshot)
+
+def synthetic_globals(rng, config):
+    global_vars = np.array([(0x100 + i, i) for i in range(32)], global_var_dtype)
+    death_counts = np.array([(0x200 + i, rng.randrange(10)) for i in range(64)], death_count_dtype)
+    regions = np.array([(0x300 + i, rng.randrange(2)) for i in range(16)], region_dtype)
+    created_records = [synthetic_spell(rng, config, i) for i in range(config.created_num)]
+
+    # Fields the writer recomputes from the data are left at 0.
+    return Globals(
+        form_ids_offset=0, records_num=0, next_object_id=0xFF000000 + config.created_num, world_id=0x3C,
+        world_x=5, world_y=-3 & 0xFFFFFFFF, pc_location=PCLocation(0x1E85E, 1024.0, 2048.0, 64.0),
+        globals_num=0, global_vars=ArrayMapping(global_vars), tes_class_size=0, num_death_counts=0,
+        death_counts=ArrayMapping(death_counts), game_time_seconds=3600.0, processes_size=0,
+        processes_data=rng.randbytes(64), spec_event_size=0, spec_event_data=rng.randbytes(8),
+        weather_size=0, weather_data=rng.randbytes(32), pc_combat_count=0, created_num=0,
+        created_records=created_records, quick_keys_size=0, quick_keys_data=[0, 1, 0x00000100, 0],
+        reticle_size=0, reticle_data=rng.randbytes(4), interface_size=0, interface_data=rng.randbytes(12),
+        regions_size=0, regions_num=0, regions_data=regions
+    )
+
+# A created spell: a FULL name, a SPIT header and `effects_num` EFID/EFIT pairs.
+def synthetic_spell(rng, config, i):
+    data = field_record(b"FULL", f"Synthetic Spell {i}".encode()) + \
+           field_record(b"SPIT", struct.pack("<4I", 0, rng.randrange(200), rng.randrange(5), 0))
+
+    for _ in range(config.effects_num):
+        effect_id = rng.choice((b"FIDG", b"REHE", b"DGHE", b"SHLD"))
+        data += field_record(b"EFID", effect_id)
+        data += field_record(b"EFIT", effect_id + struct.pack(
+            "<5I", rng.randrange(1, 100), 0, rng.randrange(1, 60), rng.randrange(3), 0xFFFFFFFF
+        ))
+
+    flags = 0
+
+    if config.compress_created:
+        data = struct.pack("<I", len(data)) + zlib.compress(data)
+        flags = COMPRESSED_FLAG
+
+    return CreatedRecord(b"SPEL", len(data), flags, 0xFF000000 + i, 0, data)
+
+def field_record(field_type, data):
+    return field_type + struct.pack("<H", len(data)) + data
+
+def synthetic_change_records(rng, config):
+    names = list(config.mix)
+    types = rng.choices([cr_type_ids[name] for name in names], [config.mix[name] for name in names],
+                        k=config.records_num)
+    plugins_num = len(config.plugins)
+    change_records: list[ChangeRecord] = []
+
+    for i, cr_type in enumerate(types):
+        form_id = (rng.randrange(plugins_num) << 24) | (0x1000 + i)
+        builder = record_builders.get(cr_type, opaque_record)
+        cr_flags, data = builder(rng)
+        change_records.append(
+            ChangeRecord(form_id, cr_type, cr_flags, rng.randrange(4), len(data), data, lazy=True)
+        )
+
+    return change_records
+
+#   Builders for the decoded types.  Each picks a random set of the flags the decoder knows about
+# and lays out the matching subrecords in the order the decoder reads them.
+def flags_from(rng, *flags):
+    return sum(flag for flag in flags if rng.random() < 0.5)
+
+def form_flags_value_record(rng):
+    cr_flags = flags_from(rng, 0x00000001, 0x00000008)
+    data = b""
+
+    if cr_flags & 0x00000001:
+        data += struct.pack("<I", rng.getrandbits(32))
+    if cr_flags & 0x00000008:
+        data += struct.pack("<I", rng.randrange(5000))
+
+    return cr_flags, data
+
+def book_record(rng):
+    cr_flags, data = form_flags_value_record(rng)
+
+    if rng.random() < 0.5:
+        cr_flags |= 0x00000004
+        data += struct.pack("<B", rng.choice((255, rng.randrange(21))))
+
+    return cr_flags, data
+
+def fact_record(rng):
+    cr_flags = flags_from(rng, 0x00000008, 0x00000004)
+    data = b""
+
+    if cr_flags & 0x00000008:
+        reactions_num = rng.randrange(6)
+        data += struct.pack("<H", reactions_num)
+
+        for _ in range(reactions_num):
+            data += struct.pack("<iI", rng.randrange(-100, 100), rng.getrandbits(32))
+    if cr_flags & 0x00000004:
+        data += struct.pack("<B", rng.randrange(4))
+
+    return cr_flags, data
+
+def crea_record(rng):
+    cr_flags = flags_from(
+        rng, 0x00000001, 0x00000008, 0x00000010, 0x00000040, 0x00000100, 0x00000020, 0x00000004,
+        0x10000000, 0x00000200, 0x00000400
+    )
+    data = b""
+
+    if cr_flags & 0x00000001:
+        data += struct.pack("<I", rng.getrandbits(32))
+    if cr_flags & 0x00000008:
+        data += rng.randbytes(8)
+    if cr_flags & 0x00000010:
+        data += struct.pack("<I6H", rng.getrandbits(32), *(rng.randrange(500) for _ in range(6)))
+    if cr_flags & 0x00000040:
+        factions_num = rng.randrange(4)
+        data += struct.pack("<H", factions_num)
+
+        for _ in range(factions_num):
+            data += struct.pack("<II", rng.getrandbits(32), rng.randrange(10))
+    if cr_flags & 0x00000100:
+        data += struct.pack("<I", rng.getrandbits(32))
+    if cr_flags & 0x00000020:
+        spells_num = rng.randrange(6)
+        data += struct.pack("<H", spells_num)
+        data += struct.pack(f"<{spells_num}I", *(rng.getrandbits(32) for _ in range(spells_num)))
+    if cr_flags & 0x00000004:
+        data += struct.pack("<I", rng.randrange(1000))
+    if cr_flags & 0x10000000:
+        modifiers_num = rng.randrange(4)
+        data += struct.pack("<H", modifiers_num)
+
+        for _ in range(modifiers_num):
+            data += struct.pack("<Bf", rng.randrange(72), rng.uniform(-50, 50))
+    if cr_flags & 0x00000200:
+        data += rng.randbytes(21)
+    if cr_flags & 0x00000400:
+        data += struct.pack("<I", rng.getrandbits(32))
+
+    return cr_flags, data
+
+def acre_record(rng):
+    cr_flags = flags_from(rng, 0x80000000, 0x00000002, 0x00000004, 0x00000008, 0x00800000, 0x00000001)
+    data = b""
+
+    if cr_flags & 0x80000000:
+        data += struct.pack("<I3f", rng.getrandbits(32), *(rng.uniform(-1e4, 1e4) for _ in range(3)))
+    if cr_flags & 0x00000002:
+        data += struct.pack("<3I6f", 0, rng.getrandbits(32), rng.getrandbits(32),
+                            *(rng.uniform(-1e4, 1e4) for _ in range(6)))
+    if cr_flags & 0x00000004:
+        data += struct.pack("<I6f", rng.getrandbits(32), *(rng.uniform(-1e4, 1e4) for _ in range(6)))
+    if cr_flags & 0x00000008 and not cr_flags & 0x00000006:
+        data += struct.pack("<6f", *(rng.uniform(-1e4, 1e4) for _ in range(6)))
+    if cr_flags & 0x00800000:
+        data += struct.pack("<I", rng.randrange(2))
+
+    data += struct.pack("<B", rng.randrange(256))
+
+    if cr_flags & 0x00000001:
+        data += struct.pack("<I", rng.getrandbits(32))
+
+    return cr_flags, data
+
+def qust_record(rng):
+    cr_flags = flags_from(rng, 0x00000004, 0x10000000)
+    data = b""
+
+    if cr_flags & 0x00000004:
+        data += struct.pack("<B", rng.randrange(4))
+    if cr_flags & 0x10000000:
+        stages_num = rng.randrange(1, 8)
+        data += struct.pack("<B", stages_num)
+
+        for i in range(stages_num):
+            data += struct.pack("<4BHH", 10*(i + 1), 1, 1, 1, rng.randrange(365), rng.randrange(433, 440))
+
+    return cr_flags, data
+
+# INFO and PACK only carry a flag.
+def flag_only_record(rng):
+    return flags_from(rng, 0x10000000), b""
+
+# Types without a decoder: random flags and bytes.
+def opaque_record(rng):
+    return rng.choice((0, 0x00000001, 0x00000002, 0x00000004, 0x80000000)), rng.randbytes(rng.randrange(120))
+
+record_builders = {
+    6: fact_record, 21: book_record, 33: form_flags_value_record, 36: crea_record,
+    39: form_flags_value_record, 51: acre_record, 58: flag_only_record, 59: qust_record,
+    61: flag_only_record,
+}
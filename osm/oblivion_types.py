@@ -1,22 +1,190 @@
-from dataclasses import dataclass
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+import hashlib
 from pprint import pprint
 import struct
+from typing import NamedTuple
+import zlib
 
+import numpy as np
 
+# Fixed-width arrays found in the globals, form IDs and world spaces sections.
+form_id_dtype = np.dtype("<u4")
+global_var_dtype = np.dtype([("form_id", "<u4"), ("value", "<f4")])
+death_count_dtype = np.dtype([("form_id", "<u4"), ("count", "<u2")])
+region_dtype = np.dtype([("form_id", "<u4"), ("value", "<u4")])
+
+#   Read-only dict view of a two-field structured array, keyed by its first field.  The array
+# itself stays available as `array`; the lookup dict is only built on first access by key.
+# `offset` is the absolute file offset of the array, when it was read from a file.
+class ArrayMapping(Mapping):
+    def __init__(self, array, offset=None):
+        self.array = array
+        self.offset = offset
+        self.key_field, self.value_field = array.dtype.names
+        self._index = None
+
+    def __getitem__(self, key):
+        if self._index is None:
+            self._index = dict(zip(self.keys_array().tolist(), self.values_array().tolist()))
+
+        return self._index[key]
+
+    def __iter__(self):
+        return iter(self.keys_array().tolist())
+
+    def __len__(self):
+        return len(self.array)
+
+    def keys_array(self):
+        return self.array[self.key_field]
+
+    def values_array(self):
+        return self.array[self.value_field]
+
+    def __str__(self):
+        return f"ArrayMapping({dict(self.items())})"
+
+    def __repr__(self):
+        return self.__str__()
+
+
+#   The save's 24-bit RGB screenshot.  The pixels are not read with the header: `source` is either
+# the buffer or the name of the file the save was read from, and `data` is filled in from
+# `offset` in it by `load`, the first time the pixels are needed.
 @dataclass
 class Screenshot:
     size: int
     width: int
     height: int
-    data: bytes
+    data: bytes | None
+    offset: int | None = None
+    source: object = field(default=None, compare=False, repr=False)
+
+    def load(self):
+        if self.data is None and self.source is not None:
+            length = 3*self.width*self.height
+
+            if isinstance(self.source, str):
+                with open(self.source, "rb") as file:
+                    file.seek(self.offset)
+                    self.data = file.read(length)
+            else:
+                self.data = self.source[self.offset:self.offset+length]
+
+        return self.data
+
+    # The pixels as a (height, width, 3) array.  On the buffered backends this is a view of the file.
+    def pixels(self):
+        data = self.load()
+
+        if data is None:
+            raise ValueError("The screenshot was skipped and has no pixel data")
+
+        return np.frombuffer(data, np.uint8, 3*self.width*self.height).reshape(self.height, self.width, 3)
+
+    #   Downscales by a whole factor so that neither side is larger than `max_size`.  "box" averages
+    # each block of pixels, "nearest" only picks one pixel per block and reads much less of them.
+    def thumbnail(self, max_size=128, resample="box"):
+        pixels = self.pixels()
+        factor = max(1, -(-max(self.width, self.height) // max_size))
+
+        if factor == 1:
+            return pixels
+        if resample == "nearest":
+            return pixels[factor//2::factor, factor//2::factor]
+
+        height, width = self.height // factor, self.width // factor
+        blocks = pixels[:height*factor, :width*factor].reshape(height, factor, width, factor, 3)
+
+        return blocks.mean(axis=(1, 3), dtype=np.float32).round().astype(np.uint8)
+
+    # The screenshot, or its thumbnail with `max_size`, as PNG file contents.
+    def to_png(self, max_size=None):
+        return encode_png(self.pixels() if max_size is None else self.thumbnail(max_size))
 
     def __str__(self):
         return f"Screenshot(size: {self.size}, width: {self.width}, height: {self.height}, " \
-               f"data: u8[{len(self.data)}])"
+               f"data: {f'u8[{3*self.width*self.height}]' if self.data is not None or self.source is not None else None})"
     
     def __repr__(self):
         return self.__str__()
 
+# Encodes a (height, width, 3) uint8 array as an 8-bit RGB PNG, unfiltered.
+def encode_png(pixels):
+    height, width, _ = pixels.shape
+    # Every scanline starts with its filter type, 0 for none.
+    rows = np.zeros((height, 1 + 3*width), np.uint8)
+    rows[:, 1:] = pixels.reshape(height, 3*width)
+
+    def chunk(chunk_type, data):
+        return struct.pack(">I", len(data)) + chunk_type + data + \
+               struct.pack(">I", zlib.crc32(chunk_type + data))
+
+    return b"\x89PNG\r\n\x1a\n" + \
+           chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) + \
+           chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)) + \
+           chunk(b"IEND", b"")
+
+# Record flag marking data as zlib-compressed: a u32 decompressed size followed by the zlib stream.
+COMPRESSED_FLAG = 0x00040000
+# Default limit on the decompressed bytes kept by `decompression_cache`.
+DECOMPRESSION_CACHE_SIZE = 32*1024*1024
+
+def decompress_record(data):
+    size = int.from_bytes(data[:4], "little")
+    decompressed = zlib.decompress(data[4:], bufsize=max(size, 1))
+
+    if len(decompressed) != size:
+        raise ValueError(f"Compressed record inflated to {len(decompressed)} bytes instead of {size}")
+
+    return decompressed
+
+#   Least recently used cache of decompressed record data, keyed by a digest of the compressed data,
+# so that reading the same compressed record again doesn't inflate it again.  The data is often a
+# view of a save's mapping, which must not be kept alive by the cache.  Entries are dropped once
+# the decompressed bytes held add up to more than `max_bytes`.
+class DecompressionCache:
+    def __init__(self, max_bytes=DECOMPRESSION_CACHE_SIZE):
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, data):
+        key = hashlib.blake2b(data, digest_size=16).digest()
+        decompressed = self.entries.get(key)
+
+        if decompressed is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return decompressed
+
+        self.misses += 1
+        decompressed = decompress_record(data)
+        size = len(decompressed)
+
+        if size <= self.max_bytes:
+            self.entries[key] = decompressed
+            self.size += size
+
+            while self.size > self.max_bytes:
+                _, old = self.entries.popitem(last=False)
+                self.size -= len(old)
+
+        return decompressed
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+decompression_cache = DecompressionCache()
+
 @dataclass
 class PCLocation:
     cell: int
@@ -32,44 +200,84 @@ class CreatedRecord:
     vc_info: int
     data: bytes
 
-    def __init__(self, record_type, size, flags, form_id, vc_info, data):
+    __slots__ = (
+        "record_type", "size", "flags", "form_id", "vc_info", "data", "data_offset", "diagnostics",
+        "_fields"
+    )
+
+    #   `offset` is the absolute file offset of `data`.  Field records of an unknown type are
+    # reported to `diagnostics`, when given.
+    #   When the record is compressed (`COMPRESSED_FLAG`), its fields are only decoded on first
+    # access, from the data inflated through `decompression_cache`.
+    def __init__(self, record_type, size, flags, form_id, vc_info, data, diagnostics=None, offset=None):
         self.record_type = record_type
         self.size = size
         self.flags = flags
         self.form_id = form_id
         self.vc_info = vc_info
         self.data = data
-        self.fields = []
+        self.data_offset = offset
+        self.diagnostics = diagnostics
+        self._fields = None
         
         # print(self.record_type)
 
+        if not self.is_compressed:
+            self._fields = self.decode_fields(self.data, self.data_offset)
+
+    @property
+    def is_compressed(self):
+        return bool(self.flags & COMPRESSED_FLAG)
+
+    # The record data, decompressed if need be.
+    @property
+    def decompressed_data(self):
+        if self.is_compressed:
+            return decompression_cache.get(self.data)
+
+        return self.data
+
+    @property
+    def fields(self):
+        if self._fields is None:
+            # Offsets into the inflated data don't map to the file.
+            self._fields = self.decode_fields(self.decompressed_data, None)
+
+        return self._fields
+
+    def decode_fields(self, data, data_offset):
+        fields = []
         offset = 0
 
-        while offset < self.size:
-            field_type = self.data[offset:offset+4]
-            field_size = int.from_bytes(self.data[offset+4:offset+6], 'little')
-            field_data = self.data[offset+6:offset+6+field_size]
+        while offset < len(data):
+            field_type = bytes(data[offset:offset+4])
+            field_size = int.from_bytes(data[offset+4:offset+6], 'little')
+            field_data = data[offset+6:offset+6+field_size]
 
-            record = FieldRecord(field_type, field_size, field_data)
-            self.fields.append(record)
+            record = FieldRecord(
+                field_type, field_size, field_data, self.diagnostics,
+                offset + 6 + data_offset if data_offset is not None else None
+            )
+            fields.append(record)
             
             offset += 6 + field_size
 
+        return fields
+
     def __str__(self, depth=0):
-        ret = "    "*depth + "CreateRecord {\n" + \
-              "    "*(depth+1)+ f"record_type: {self.record_type},\n" + \
-              "    "*(depth+1)+ f"size: {self.size},\n" + \
-              "    "*(depth+1)+ f"flags: {self.flags},\n" + \
-              "    "*(depth+1)+ f"form_id: {hex(self.form_id).upper()},\n" + \
-              "    "*(depth+1)+ f"vc_info: {self.vc_info},\n" + \
-              "    "*(depth+1)+  "fields: [\n"
-        
-        for field in self.fields:
-            ret += field.__str__(depth+2)
-            ret += "]" + \
-                   "    "*depth + "},\n"
-        
-        return ret
+        parts = [
+            "    "*depth + "CreateRecord {\n",
+            "    "*(depth+1) + f"record_type: {self.record_type},\n",
+            "    "*(depth+1) + f"size: {self.size},\n",
+            "    "*(depth+1) + f"flags: {self.flags},\n",
+            "    "*(depth+1) + f"form_id: {hex(self.form_id).upper()},\n",
+            "    "*(depth+1) + f"vc_info: {self.vc_info},\n",
+            "    "*(depth+1) + "fields: [\n",
+        ]
+        parts.extend(field.__str__(depth+2) for field in self.fields)
+        parts.append("]" + "    "*depth + "},\n")
+
+        return "".join(parts)
     
     def __repr__(self):
         return self.__str__()
@@ -104,10 +312,10 @@ class Globals:
     world_y: int
     pc_location: PCLocation
     globals_num: int
-    global_vars: dict[int, float]
+    global_vars: ArrayMapping
     tes_class_size: int
     num_death_counts: int
-    death_counts: dict[int, int]
+    death_counts: ArrayMapping
     game_time_seconds: int
     processes_size: int
     processes_data: bytes
@@ -126,7 +334,7 @@ class Globals:
     interface_data: bytes
     regions_size: int
     regions_num: int
-    regions_data: list[tuple[int, int]] 
+    regions_data: np.ndarray
 
 
 {
@@ -166,6 +374,65 @@ cr_type_names = {
     51: "ACRE", 58: "INFO", 59: "QUST", 61: "PACK",
 
 }
+cr_type_ids = {name: cr_type for cr_type, name in cr_type_names.items()}
+# Change record types that `ChangeRecord.decode_subrecords` has a decoder for.
+decoded_cr_types = frozenset((6, 21, 33, 36, 39, 51, 58, 59, 61))
+
+#   Subrecords with the same layout have equal `field_offsets` tables, so a single copy of each is
+# shared between them.  The tables must not be modified.
+field_offsets_tables: dict[tuple, dict] = {}
+
+def shared_field_offsets(field_offsets):
+    return field_offsets_tables.setdefault(tuple(field_offsets.items()), field_offsets)
+
+# Attributes of the decoded record classes that are not decoded values: raw input and parse bookkeeping.
+RAW_FIELDS = frozenset(("data", "size", "field_offsets", "diagnostics", "data_offset", "source", "record"))
+# Subrecord attributes that repeat the change record header.
+HEADER_FIELDS = frozenset(("form_id", "cr_flags"))
+
+decoded_field_names_by_class: dict[type, tuple] = {}
+
+#   The attributes of a slotted record class that hold decoded values: its `__slots__` minus
+# `RAW_FIELDS`, and minus `HEADER_FIELDS` for change record subrecords.  This is what the exporters
+# and the diff compare and write out.
+def decoded_field_names(cls):
+    names = decoded_field_names_by_class.get(cls)
+
+    if names is None:
+        skipped = RAW_FIELDS | HEADER_FIELDS if "cr_flags" in cls.__slots__ else RAW_FIELDS
+        names = decoded_field_names_by_class[cls] = tuple(name for name in cls.__slots__ if name not in skipped)
+
+    return names
+
+# (name, value) of the decoded fields of `record` that are set.
+def decoded_fields(record):
+    for name in decoded_field_names(type(record)):
+        if hasattr(record, name):
+            yield name, getattr(record, name)
+
+# Names and other strings in a save are stored as bytes.
+def decode_text(value):
+    return bytes(value).decode("utf-8", errors="replace")
+
+#   Equality for decoded values, for telling whether a decoded field was changed: NaN equals NaN,
+# and decoded records and arrays compare by value.
+def same_value(a, b):
+    if type(a) is not type(b):
+        return a == b if isinstance(a, (int, float)) and isinstance(b, (int, float)) else False
+    if isinstance(a, np.ndarray):
+        return np.array_equal(a, b, equal_nan=a.dtype.kind in "fc")
+    if a == b:
+        return True
+    if isinstance(a, float):
+        return a != a and b != b
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(same_value(x, y) for x, y in zip(a, b))
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same_value(a[key], b[key]) for key in a)
+    if hasattr(type(a), "__slots__") and not isinstance(a, (bytes, str)):
+        return all(same_value(value, getattr(b, name, None)) for name, value in decoded_fields(a))
+
+    return False
 
 class ChangeRecord:
     form_id: int
@@ -174,58 +441,155 @@ class ChangeRecord:
     version: int
     data_size: int
     data: bytes
-
-    def __init__(self, form_id, cr_type, cr_flags, version, data_size, data):
+    offset: int
+
+    __slots__ = (
+        "cr_form_id", "cr_type", "cr_flags", "version", "data_size", "_data", "source", "offset",
+        "modified", "_subrecords", "exposed"
+    )
+
+    #   `offset` is the absolute file offset of the record header.  When `lazy` is set only the
+    # header is kept and `subrecords` is decoded on first access.
+    #   With `source`, the buffer the record was read from, `data` is None and is sliced from
+    # `source` on access instead of every record holding a view of its own.
+    #   `modified` is set by `set_data`; the writer copies every other record byte-for-byte from
+    # the file it was read from.
+    #   `exposed` is set once `subrecords` has been handed out, after which the decoded fields may
+    # have been assigned; see `changed_fields`.
+    def __init__(self, form_id, cr_type, cr_flags, version, data_size, data, offset=None, lazy=False,
+                 source=None):
         self.cr_form_id = form_id
         self.cr_type = cr_type
         self.cr_flags = cr_flags
         self.version = version
         self.data_size = data_size
+        self._data = data
+        self.source = source
+        self.offset = offset
+        self.modified = False
+        self._subrecords = None
+        self.exposed = False
+
+        if not lazy:
+            self._subrecords = self.decode_subrecords()
+
+    @property
+    def data(self):
+        if self._data is None and self.source is not None:
+            start = self.offset + 12
+            return self.source[start:start+self.data_size]
+
+        return self._data
+
+    #   Assigning the data detaches the record from `source`, e.g. to copy it out of a mapping
+    # before pickling.
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self.source = None
+
+    @property
+    def has_form_flags(self):
+        return bool(self.cr_flags & 0x00000001)
+
+    @property
+    def subrecords(self):
+        if self._subrecords is None:
+            self._subrecords = self.decode_subrecords()
+
+        self.exposed = True
+        return self._subrecords
+
+    @subrecords.setter
+    def subrecords(self, subrecords):
+        self._subrecords = subrecords
+        self.exposed = subrecords is not None
+
+    @property
+    def is_decoded(self):
+        return self._subrecords is not None
+
+    # Replaces the record's data.  Subrecords are decoded again from the new data on next access.
+    def set_data(self, data):
         self.data = data
-        self.subrecords = []
-
-        self.has_form_flags = bool(self.cr_flags & 0x00000001)
-
-
+        self.data_size = len(data)
+        self.modified = True
+        self._subrecords = None
+
+    #   The names of the decoded fields, as "<subrecord index>.<field>", whose values no longer match
+    # the record's data.  Decoded fields are not encoded back into the data: `set_data` and
+    # `SavePatcher` are the only ways to edit a record, and the writer refuses records for which
+    # this is not empty rather than silently dropping the change.
+    def changed_fields(self):
+        if not self._subrecords:
+            return []
+
+        return [
+            f"{i}.{name}"
+            for i, (subrecord, decoded) in enumerate(zip(self._subrecords, self.decode_subrecords()))
+            for name, value in decoded_fields(subrecord)
+            if not same_value(value, getattr(decoded, name, None))
+        ]
+
+    def check_decoded_fields(self):
+        changed = self.changed_fields() if self.exposed else None
+
+        if changed:
+            raise ValueError(
+                f"Decoded fields {', '.join(changed)} of change record {hex(self.cr_form_id)} were changed, "
+                "but are not written back; edit the record with set_data or SavePatcher instead"
+            )
+
+    # Returns the subrecords as a tuple; types without a decoder share the empty tuple.
+    def decode_subrecords(self):
+        subrecords = []
 
         match self.cr_type:
             case 6:
-                self.subrecords.append(FACT(self.cr_form_id, self.cr_flags, self.data_size, self.data))
-                # print(self.subrecords[-1])
+                subrecords.append(FACT(self.cr_form_id, self.cr_flags, self.data_size, self.data))
+                # print(subrecords[-1])
             case 19:
-                print("APPA")
+                # print("APPA")
+                pass
             case 20:
-                print("ARMO")
+                # print("ARMO")
+                pass
             case 21:
-                self.subrecords.append(BOOK(self.cr_form_id, self.cr_flags, self.data_size, self.data))
-                # print(self.subrecords[-1])
+                subrecords.append(BOOK(self.cr_form_id, self.cr_flags, self.data_size, self.data))
+                # print(subrecords[-1])
             case 22:
-                print("CLOT")
+                # print("CLOT")
+                pass
             case 25:
-                print("INGR")
+                # print("INGR")
+                pass
             case 26:
-                print("LIGH")
+                # print("LIGH")
+                pass
             case 27:
-                print("MISC")
+                # print("MISC")
+                pass
             case 33:
-                self.subrecords.append(WEAP(self.cr_form_id, self.cr_flags, self.data_size, self.data))
-                # print(self.subrecords[-1])
+                subrecords.append(WEAP(self.cr_form_id, self.cr_flags, self.data_size, self.data))
+                # print(subrecords[-1])
             case 34:
-                print("AMMO")
+                # print("AMMO")
+                pass
             case 35:
                 # print("NPC_")
                 pass
             case 36: 
-                self.subrecords.append(CREA(self.cr_flags, self.data_size, self.data))
-                # print(self.subrecords[-1])
+                subrecords.append(CREA(self.cr_flags, self.data_size, self.data))
+                # print(subrecords[-1])
             case 38:
-                print("SLGM")
+                # print("SLGM")
                 pass
             case 39: 
-                self.subrecords.append(KEYM(self.cr_form_id, self.cr_flags, self.data_size, self.data))
-                # print(self.subrecords[-1])
+                subrecords.append(KEYM(self.cr_form_id, self.cr_flags, self.data_size, self.data))
+                # print(subrecords[-1])
             case 40:
-                print("ALCH")
+                # print("ALCH")
+                pass
             case 48:
                 # print("CELL")
                 pass
@@ -236,22 +600,65 @@ class ChangeRecord:
                 # print("ACHR")
                 pass
             case 51:
-                self.subrecords.append(ACRE(self.cr_form_id, self.cr_flags, self.data_size, self.data))
-                print(self.subrecords[-1])
+                subrecords.append(ACRE(self.cr_form_id, self.cr_flags, self.data_size, self.data))
+                # print(subrecords[-1])
             case 58:
-                self.subrecords.append(INFO(self.cr_form_id, self.cr_flags, self.data_size, self.data))
-                # print(self.subrecords[-1])
+                subrecords.append(INFO(self.cr_form_id, self.cr_flags, self.data_size, self.data))
+                # print(subrecords[-1])
             case 59:
-                self.subrecords.append(QUST(self.cr_form_id, self.cr_flags, self.data_size, self.data))
-                # print(self.subrecords[-1])
+                subrecords.append(QUST(self.cr_form_id, self.cr_flags, self.data_size, self.data))
+                # print(subrecords[-1])
             case 61:
-                self.subrecords.append(PACK(self.cr_form_id, self.cr_flags, self.data_size, self.data))
-                # print(self.subrecords[-1])
+                subrecords.append(PACK(self.cr_form_id, self.cr_flags, self.data_size, self.data))
+                # print(subrecords[-1])
             case _:
-                print(f"[E] Unknown change record type: {self.cr_type}")
+                # Counted by the reader, see `decoded_cr_types`.
+                pass
+
+        return tuple(subrecords)
+
+class CellChanged(NamedTuple):
+    cell: int
+    x: float
+    y: float
+    z: float
+
+class Created(NamedTuple):
+    flags: int
+    base_item: int
+    cell: int
+    x: float
+    y: float
+    z: float
+    rx: float
+    ry: float
+    rz: float
+
+class Moved(NamedTuple):
+    cell: int
+    x: float
+    y: float
+    z: float
+    rx: float
+    ry: float
+    rz: float
+
+class HavocMoved(NamedTuple):
+    cell: int
+    x: float
+    y: float
+    z: float
+    rx: float
+    ry: float
+    rz: float
 
 # https://en.uesp.net/wiki/Oblivion_Mod:Save_File_Format/ACHR#Cell_Changed
 class ACRE:
+    __slots__ = (
+        "form_id", "cr_flags", "size", "data", "cell_changed", "created", "moved", "havoc_moved",
+        "oblivion_flag", "actor_flag", "form_flags", "inventory", "properties", "field_offsets"
+    )
+
     def __init__(self, form_id, cr_flags, size, data):
         self.form_id = form_id
         self.cr_flags = cr_flags
@@ -267,43 +674,25 @@ class ACRE:
         self.form_flags = None
         self.inventory = None
         self.properties = None
+        # field name -> (offset in data, struct format), for same-size patching.
+        self.field_offsets = {}
 
         offset = 0
 
         # Cell Changed
         # https://en.uesp.net/wiki/Oblivion_Mod:Save_File_Format/ACHR#Cell_Changed
         if cr_flags & 0x80000000:
-            self.cell_changed = {}
-            self.cell_changed["cell"] = int.from_bytes(self.data[offset:offset+4], "little")
-            self.cell_changed["x"] = struct.unpack("f", self.data[offset+4:offset+8])[0]
-            self.cell_changed["y"] = struct.unpack("f", self.data[offset+8:offset+12])[0]
-            self.cell_changed["z"] = struct.unpack("f", self.data[offset+12:offset+16])[0]
+            self.cell_changed = CellChanged._make(struct.unpack_from("<I3f", self.data, offset))
             offset += 16
         # Created
         # https://en.uesp.net/wiki/Oblivion_Mod:Save_File_Format/ACHR#Created
         if cr_flags & 0x00000002:
-            self.created = {}
-            self.created["flags"] = int.from_bytes(self.data[offset:offset+4], "little")
-            self.created["base_item"] = int.from_bytes(self.data[offset+4:offset+8], "little")
-            self.created["cell"] = int.from_bytes(self.data[offset+8:offset+12], "little")
-            self.created["x"] = struct.unpack("f", self.data[offset+12:offset+16])[0]
-            self.created["y"] = struct.unpack("f", self.data[offset+16:offset+20])[0]
-            self.created["z"] = struct.unpack("f", self.data[offset+20:offset+24])[0]
-            self.created["rx"] = struct.unpack("f", self.data[offset+24:offset+28])[0]
-            self.created["ry"] = struct.unpack("f", self.data[offset+28:offset+32])[0]
-            self.created["rz"] = struct.unpack("f", self.data[offset+32:offset+36])[0]
+            self.created = Created._make(struct.unpack_from("<3I6f", self.data, offset))
             offset += 36
         # Moved
         # https://en.uesp.net/wiki/Oblivion_Mod:Save_File_Format/ACHR#Moved
         if cr_flags & 0x00000004:
-            self.moved = {}
-            self.moved["cell"] = int.from_bytes(self.data[offset:offset+4], "little")
-            self.moved["x"] = struct.unpack("f", self.data[offset+4:offset+8])[0]
-            self.moved["y"] = struct.unpack("f", self.data[offset+8:offset+12])[0]
-            self.moved["z"] = struct.unpack("f", self.data[offset+12:offset+16])[0]
-            self.moved["rx"] = struct.unpack("f", self.data[offset+16:offset+20])[0]
-            self.moved["ry"] = struct.unpack("f", self.data[offset+20:offset+24])[0]
-            self.moved["rz"] = struct.unpack("f", self.data[offset+24:offset+28])[0]
+            self.moved = Moved._make(struct.unpack_from("<I6f", self.data, offset))
             offset += 28
         # Havoc Moved
         # https://en.uesp.net/wiki/Oblivion_Mod:Save_File_Format/ACHR#Havok_Moved
@@ -312,32 +701,33 @@ class ACRE:
         # bit 2 are set, skip parsing this subrecord.
         if bool(cr_flags & 0x00000008):
             if not bool(cr_flags & 0x00000002) and not bool(cr_flags & 0x00000004):
-                self.havoc_moved = {}
-                self.havoc_moved["cell"] = int.from_bytes(self.data[offset:offset+4], "little")
-                self.havoc_moved["x"] = struct.unpack("f", self.data[offset:offset+4])[0]
-                self.havoc_moved["y"] = struct.unpack("f", self.data[offset+4:offset+8])[0]
-                self.havoc_moved["z"] = struct.unpack("f", self.data[offset+8:offset+12])[0]
-                self.havoc_moved["rx"] = struct.unpack("f", self.data[offset+12:offset+16])[0]
-                self.havoc_moved["ry"] = struct.unpack("f", self.data[offset+16:offset+20])[0]
-                self.havoc_moved["rz"] = struct.unpack("f", self.data[offset+20:offset+24])[0]
+                # The cell and x are both read from the first 4 bytes, as the decoder always has.
+                self.havoc_moved = HavocMoved(
+                    int.from_bytes(self.data[offset:offset+4], "little"), *struct.unpack_from("<6f", self.data, offset)
+                )
                 offset += 24
         # Oblivion Flag
         # https://en.uesp.net/wiki/Oblivion_Mod:Save_File_Format/ACHR#Oblivion_Flag
         if cr_flags & 0x00800000:
             self.oblivion_flag = int.from_bytes(self.data[offset:offset+4], "little")
+            self.field_offsets["oblivion_flag"] = (offset, "<I")
             offset += 4
         # Actor Flag
         # https://en.uesp.net/wiki/Oblivion_Mod:Save_File_Format/ACHR#Actor_Flag
         self.actor_flag = int.from_bytes(self.data[offset:offset+1], "little")
+        self.field_offsets["actor_flag"] = (offset, "<B")
         offset += 1
         # Form Flags
         # https://en.uesp.net/wiki/Oblivion_Mod:Save_File_Format/ACHR#Form_Flags
         if cr_flags & 0x00000001:
             self.form_flags = int.from_bytes(self.data[offset:offset+4], "little")
+            self.field_offsets["form_flags"] = (offset, "<I")
             offset += 4
         # Inventory
         # https://en.uesp.net/wiki/Oblivion_Mod:Save_File_Format/ACHR#Inventory
 
+        self.field_offsets = shared_field_offsets(self.field_offsets)
+
 
 
     def __str__(self, depth=0):
@@ -367,6 +757,10 @@ class ACRE:
 # record's overall Flags. Its length is a constant 1 byte. A value of 255
 # indicates that the book teaches has been read and teaches no skills.
 class BOOK:
+    __slots__ = (
+        "form_id", "cr_flags", "size", "data", "form_flags", "value", "teaches", "field_offsets"
+    )
+
     def __init__(self, form_id, cr_flags, size, data):
         self.form_id = form_id
         self.cr_flags = cr_flags
@@ -376,17 +770,23 @@ class BOOK:
         self.form_flags = None
         self.value = None
         self.teaches = None
+        self.field_offsets = {}
 
         offset = 0
 
         if cr_flags & 0x00000001:
             self.form_flags = int.from_bytes(self.data[:4], "little")
+            self.field_offsets["form_flags"] = (0, "<I")
             offset += 4
         if cr_flags & 0x00000008:
             self.value = int.from_bytes(self.data[offset:offset+4], "little")
+            self.field_offsets["value"] = (offset, "<I")
             offset += 4
         if cr_flags & 0x00000004:
             self.teaches = int.from_bytes(self.data[offset:offset+1], "little")
+            self.field_offsets["teaches"] = (offset, "<B")
+
+        self.field_offsets = shared_field_offsets(self.field_offsets)
     
     def __str__(self, depth=0):
         return "   "*depth + "BOOK {\n" + \
@@ -400,7 +800,55 @@ class BOOK:
     def __repr__(self):
         return self.__str__()
     
+class BaseAttributes(NamedTuple):
+    strength: int
+    intelligence: int
+    willpower: int
+    agility: int
+    speed: int
+    endurance: int
+    personality: int
+    luck: int
+
+class BaseData(NamedTuple):
+    flags: int
+    base_magicka: int
+    base_fatigue: int
+    bartar_gold: int
+    level: int
+    calc_min: int
+    calc_max: int
+
+class Skills(NamedTuple):
+    armorer: int
+    athletics: int
+    blade: int
+    block: int
+    blunt: int
+    hand_to_hand: int
+    heavy_armor: int
+    alchemy: int
+    alteration: int
+    conjuration: int
+    destruction: int
+    illusion: int
+    mysticism: int
+    restoration: int
+    acrobatics: int
+    light_armor: int
+    marksman: int
+    mercantile: int
+    security: int
+    sneak: int
+    speechcraft: int
+
 class CREA:
+    __slots__ = (
+        "cr_flags", "size", "data", "form_flags", "base_health", "base_attributes", "base_data",
+        "spell_list", "factions", "full_name", "ai_data", "skills", "combat_style",
+        "base_modifiers", "field_offsets", "factions_num", "spell_count", "base_modifiers_num"
+    )
+
     def __init__(self, cr_flags, size, data):
         self.cr_flags = cr_flags
         self.size = size
@@ -417,31 +865,26 @@ class CREA:
         self.skills = None
         self.combat_style = None
         self.base_modifiers = None
+        self.field_offsets = {}
 
         offset = 0
 
         # Form Flags
         if cr_flags & 0x00000001:
             self.form_flags = int.from_bytes(self.data[:4], "little")
+            self.field_offsets["form_flags"] = (0, "<I")
             offset += 4
         # Base Attributes
         if cr_flags & 0x00000008:
-            self.base_attributes = {}
-            attributes = ["strength", "intelligence", "willpower", "agility", "speed", "endurance", "personality", "luck"]
-            
-            for i, attr in enumerate(attributes):
-                self.base_attributes[attr] = int.from_bytes(self.data[offset+i:offset+i+1], "little")    
+            self.base_attributes = BaseAttributes._make(struct.unpack_from("<8B", self.data, offset))
             offset += 8
         # Base Data
         if cr_flags & 0x00000010:
-            self.base_data = {}
-            self.base_data["flags"] = int.from_bytes(self.data[offset:offset+4], "little")
-            self.base_data["base_magicka"] = int.from_bytes(self.data[offset+4:offset+6], "little")
-            self.base_data["base_fatigue"] = int.from_bytes(self.data[offset+6:offset+8], "little")
-            self.base_data["bartar_gold"] = int.from_bytes(self.data[offset+8:offset+10], "little")
-            self.base_data["level"] = int.from_bytes(self.data[offset+10:offset+12], "little")
-            self.base_data["calc_min"] = int.from_bytes(self.data[offset+12:offset+14], "little")
-            self.base_data["calc_max"] = int.from_bytes(self.data[offset+14:offset+16], "little")
+            self.base_data = BaseData._make(struct.unpack_from("<I6H", self.data, offset))
+
+            # flags is a u32, the other base data fields are u16s.
+            for i, key in enumerate(BaseData._fields):
+                self.field_offsets[f"base_data.{key}"] = (offset, "<I") if i == 0 else (offset + 2 + 2*i, "<H")
             offset += 16
         # Faction List
         if cr_flags & 0x00000040:
@@ -451,13 +894,14 @@ class CREA:
             
             for _ in range(self.factions_num):
                 self.factions.append(
-                    [int.from_bytes(self.data[offset:offset+4], "little")
-                     ,int.from_bytes(self.data[offset+4:offset+8], "little")]
+                    (int.from_bytes(self.data[offset:offset+4], "little"),
+                     int.from_bytes(self.data[offset+4:offset+8], "little"))
                 )
                 offset += 8
         # AI Data
         if cr_flags & 0x00000100:
             self.ai_data = int.from_bytes(self.data[offset:offset+4], "little")
+            self.field_offsets["ai_data"] = (offset, "<I")
             offset += 4
         # Spell List
         if cr_flags & 0x00000020:
@@ -470,6 +914,7 @@ class CREA:
         # Base Health
         if cr_flags & 0x00000004:
             self.base_health = int.from_bytes(self.data[offset:offset+4], "little")
+            self.field_offsets["base_health"] = (offset, "<I")
             offset += 4
         # Base Modifiers
         # https://en.uesp.net/wiki/Oblivion_Mod:Actor_Value_Indices
@@ -484,26 +929,20 @@ class CREA:
                 offset += 5
         # Full Name
         if cr_flags & 0x00000080:
-            self.full_name = self.data[offset:self.size].decode("utf-8")
+            self.full_name = bytes(self.data[offset:self.size]).decode("utf-8")
             offset += self.size
         # Skills
         if cr_flags & 0x00000200:
-            self.skills = {}
-            self.skills_names = [
-                "Armorer", "Athletics", "Blade", "Block", "Blunt", "Hand to Hand", "Heavy Armor",
-                "Alchemy", "Alteration", "Conjuration", "Destruction", "Illusion", "Mysticism",
-                "Restoration", "Acrobatics", "Light Armor", "Marksman", "Mercantile", "Security",
-                "Sneak", "Speechcraft"
-            ]
-            
-            for i, skill in enumerate(self.skills_names):
-                self.skills[skill] = int.from_bytes(self.data[offset+i:offset+i+1], "little")
+            self.skills = Skills._make(struct.unpack_from("<21B", self.data, offset))
             offset += 21
         # Combat Style
         if cr_flags & 0x00000400:
             self.combat_style = int.from_bytes(self.data[offset:offset+4], "little")
+            self.field_offsets["combat_style"] = (offset, "<I")
             offset += 4
 
+        self.field_offsets = shared_field_offsets(self.field_offsets)
+
 
     def __str__(self, depth=0):
         return "   "*depth + "CREA {\n" + \
@@ -525,6 +964,11 @@ class CREA:
         return self.__str__()
 
 class FACT:
+    __slots__ = (
+        "form_id", "cr_flags", "size", "data", "reactions_num", "reactions", "flags",
+        "field_offsets"
+    )
+
     def __init__(self, form_id, cr_flags, size, data):
         self.form_id = form_id
         self.cr_flags = cr_flags
@@ -534,6 +978,7 @@ class FACT:
         self.reactions_num = None
         self.reactions = None
         self.flags = None
+        self.field_offsets = {}
 
         offset = 0
 
@@ -551,26 +996,33 @@ class FACT:
 
         if cr_flags & 0x00000004:
             self.flags = int.from_bytes(self.data[offset:offset+1], "little")
+            self.field_offsets["flags"] = (offset, "<B")
 
+        self.field_offsets = shared_field_offsets(self.field_offsets)
 
-    def __str__(self, depth=0):
-        ret =  "   "*depth + "FACT {\n" + \
-               "   "*(depth+1) + f"form_id: {hex(self.form_id)},\n" + \
-               "   "*(depth+1) + f"cr_flags: {self.cr_flags},\n" + \
-               "   "*(depth+1) + f"reactions_num: {self.reactions_num},\n"
-        
-        for reaction in self.reactions:
-            ret += "   "*(depth+2) + f"reaction: ({reaction[0]}, {hex(reaction[1])}),\n"
 
-        ret += "   "*(depth+1) + f"flags: {self.flags},\n" + \
-               "   "*(depth) + "}"
+    def __str__(self, depth=0):
+        parts = [
+            "   "*depth + "FACT {\n",
+            "   "*(depth+1) + f"form_id: {hex(self.form_id)},\n",
+            "   "*(depth+1) + f"cr_flags: {self.cr_flags},\n",
+            "   "*(depth+1) + f"reactions_num: {self.reactions_num},\n",
+        ]
+        parts.extend(
+            "   "*(depth+2) + f"reaction: ({reaction[0]}, {hex(reaction[1])}),\n"
+            for reaction in self.reactions or ()
+        )
+        parts.append("   "*(depth+1) + f"flags: {self.flags},\n")
+        parts.append("   "*(depth) + "}")
         
-        return ret
+        return "".join(parts)
     
     def __repr__(self):
         return self.__str__()
 
 class INFO:
+    __slots__ = ("form_id", "cr_flags", "size", "data", "topic_once_said")
+
     def __init__(self, form_id, cr_flags, size, data):
         self.form_id = form_id
         self.cr_flags = cr_flags
@@ -590,6 +1042,8 @@ class INFO:
         return self.__str__()
 
 class KEYM:
+    __slots__ = ("form_id", "cr_flags", "size", "data", "form_flags", "value", "field_offsets")
+
     def __init__(self, form_id, cr_flags, size, data):
         self.form_id = form_id
         self.cr_flags = cr_flags
@@ -598,14 +1052,19 @@ class KEYM:
         # optional fields
         self.form_flags = None
         self.value = None
+        self.field_offsets = {}
 
         offset = 0
 
         if cr_flags & 0x00000001:
             self.form_flags = int.from_bytes(self.data[:4], "little")
+            self.field_offsets["form_flags"] = (0, "<I")
             offset += 4
         if cr_flags & 0x00000008:
             self.value = int.from_bytes(self.data[offset:offset+4], "little")
+            self.field_offsets["value"] = (offset, "<I")
+
+        self.field_offsets = shared_field_offsets(self.field_offsets)
 
     def __str__(self, depth=0):
         return "   "*depth + "KEYM {\n" + \
@@ -619,6 +1078,8 @@ class KEYM:
         return self.__str__()
 
 class PACK:
+    __slots__ = ("form_id", "cr_flags", "size", "data", "never_run")
+
     def __init__(self, form_id, cr_flags, size, data):
         self.form_id = form_id
         self.cr_flags = cr_flags
@@ -637,7 +1098,23 @@ class PACK:
     def __repr__(self):
         return self.__str__()
 
+class StageEntry(NamedTuple):
+    num: int
+    completion_day: int
+    completion_year: int
+
+class QuestStage(NamedTuple):
+    index: int
+    flag: int
+    entry_num: int
+    entry: StageEntry
+
 class QUST:
+    __slots__ = (
+        "form_id", "cr_flags", "size", "data", "flags", "quest_stages", "quest_script",
+        "field_offsets", "quest_stages_num"
+    )
+
     def __init__(self, form_id, cr_flags, size, data):
         self.form_id = form_id
         self.cr_flags = cr_flags
@@ -647,12 +1124,14 @@ class QUST:
         self.flags = None
         self.quest_stages = None
         self.quest_script = None
+        self.field_offsets = {}
 
         offset = 0
 
         # Quest Flags
         if cr_flags & 0x00000004:
             self.flags = int.from_bytes(self.data[:1], "little")
+            self.field_offsets["flags"] = (0, "<B")
             offset += 1
         # Quest Stages
         if cr_flags & 0x10000000:
@@ -662,16 +1141,14 @@ class QUST:
             self.quest_stages = []
 
             for i in range(self.quest_stages_num):
-                stage = {}
-                stage_entry = {}
-                stage["index"] = int.from_bytes(self.data[offset:offset+1], "little")
-                stage["flag"] = int.from_bytes(self.data[offset+1:offset+2], "little")
-                stage["entry_num"] = int.from_bytes(self.data[offset+2:offset+3], "little")
-                stage_entry["num"] = int.from_bytes(self.data[offset+3:offset+4], "little")
-                stage_entry["completion_day"] = int.from_bytes(self.data[offset+4:offset+6], "little")
-                stage_entry["completion_year"] = int.from_bytes(self.data[offset+6:offset+8], "little")
-                stage["entry"] = stage_entry
-                self.quest_stages.append(stage)
+                index, flag, entry_num, num, completion_day, completion_year = \
+                    struct.unpack_from("<4BHH", self.data, offset)
+                self.quest_stages.append(
+                    QuestStage(index, flag, entry_num, StageEntry(num, completion_day, completion_year))
+                )
+                self.field_offsets[f"quest_stages.{i}.flag"] = (offset+1, "<B")
+                self.field_offsets[f"quest_stages.{i}.entry.completion_day"] = (offset+4, "<H")
+                self.field_offsets[f"quest_stages.{i}.entry.completion_year"] = (offset+6, "<H")
                 offset += 8
         # Quest Script
         if cr_flags & 0x08000000:
@@ -679,30 +1156,39 @@ class QUST:
             # https://en.uesp.net/wiki/Oblivion_Mod:Save_File_Format/QUST
             pass
 
+        self.field_offsets = shared_field_offsets(self.field_offsets)
+
     def __str__(self, depth=0):
-        ret = "   "*depth + "QUST {\n" + \
-              "   "*(depth+1) + f"form_id: {hex(self.form_id)},\n" + \
-              "   "*(depth+1) + f"cr_flags: {self.cr_flags},\n" + \
-              "   "*(depth+1) + f"flags: {self.flags},\n" + \
-              "   "*(depth+1) + f"quest_stages: ["
-        if self.quest_stages:       
-            for stage in self.quest_stages:
-                ret += "\n" + "   "*(depth+1) + "{\n" + \
-                       "   "*(depth+2) + f"index: {stage['index']},\n" + \
-                       "   "*(depth+2) + f"flag: {stage['flag']},\n" + \
-                       "   "*(depth+2) + f"entry_num: {stage['entry_num']},\n" + \
-                       "   "*(depth+2) + f"entry: {stage['entry']},\n" + \
-                       "   "*(depth+1) + "},"
-        ret += "]\n"
-        ret += "   "*(depth+1) + f"quest_script: {self.quest_script}\n"
-        ret += "   "*(depth) + "}"
-
-        return ret
+        parts = [
+            "   "*depth + "QUST {\n",
+            "   "*(depth+1) + f"form_id: {hex(self.form_id)},\n",
+            "   "*(depth+1) + f"cr_flags: {self.cr_flags},\n",
+            "   "*(depth+1) + f"flags: {self.flags},\n",
+            "   "*(depth+1) + "quest_stages: [",
+        ]
+
+        for stage in self.quest_stages or ():
+            parts += [
+                "\n" + "   "*(depth+1) + "{\n",
+                "   "*(depth+2) + f"index: {stage.index},\n",
+                "   "*(depth+2) + f"flag: {stage.flag},\n",
+                "   "*(depth+2) + f"entry_num: {stage.entry_num},\n",
+                "   "*(depth+2) + f"entry: {stage.entry},\n",
+                "   "*(depth+1) + "},",
+            ]
+
+        parts.append("]\n")
+        parts.append("   "*(depth+1) + f"quest_script: {self.quest_script}\n")
+        parts.append("   "*(depth) + "}")
+
+        return "".join(parts)
     
     def __repr__(self):
         return self.__str__()
         
 class WEAP:
+    __slots__ = ("form_id", "cr_flags", "size", "data", "form_flags", "value", "field_offsets")
+
     def __init__(self, form_id, cr_flags, size, data):
         self.form_id = form_id
         self.cr_flags = cr_flags
@@ -711,14 +1197,19 @@ class WEAP:
         # optional fields
         self.form_flags = None
         self.value = None
+        self.field_offsets = {}
 
         offset = 0
 
         if cr_flags & 0x00000001:
             self.form_flags = int.from_bytes(self.data[:4], "little")
+            self.field_offsets["form_flags"] = (0, "<I")
             offset += 4
         if cr_flags & 0x00000008:
             self.value = int.from_bytes(self.data[offset:offset+4], "little")
+            self.field_offsets["value"] = (offset, "<I")
+
+        self.field_offsets = shared_field_offsets(self.field_offsets)
 
     def __str__(self, depth=0):
         return "   "*depth + "WEAP {\n" + \
@@ -734,7 +1225,9 @@ class WEAP:
 
 
 class SubRecord:
-    def __init__(self, rec_type, size, flags, form_id, version, data):
+    __slots__ = ("form_id", "rec_type", "flags", "version", "data_size", "data", "record")
+
+    def __init__(self, rec_type, size, flags, form_id, version, data, diagnostics=None, offset=None):
         self.form_id = form_id
         self.rec_type = rec_type
         self.flags = flags
@@ -745,10 +1238,12 @@ class SubRecord:
 
         # Is the data compressed?
         if self.flags & 0x00040000:
-            print(f"[E] Compressed data: {self.rec_type}: ")
+            if diagnostics is not None:
+                diagnostics.report("compressed_subrecord", self.rec_type, size, offset)
             self.record = None
         elif self.rec_type not in cr_type_names:
-            print(f"[E] Unknown subrecord type: {self.rec_type}: ")
+            if diagnostics is not None:
+                diagnostics.report("unknown_subrecord", self.rec_type, size, offset)
             self.record = None
 
         # match self.rec_type:
@@ -770,15 +1265,17 @@ class TemporaryEffects:
 @dataclass
 class FormIds:
     num: int
-    ids: list[int]
+    ids: np.ndarray
 
 @dataclass
 class WorldSpaces:
     num: int
-    spaces: list[int]
+    spaces: np.ndarray
 
 class FieldRecord:
-    def __init__(self, type, size, data):
+    __slots__ = ("_type", "size", "data", "record")
+
+    def __init__(self, type, size, data, diagnostics=None, offset=None):
         self._type = type
         self.size = size
         self.data = data
@@ -796,7 +1293,9 @@ class FieldRecord:
             case b"MODB": self.record = MODB(self.size, self.data)
             case b"MODL": self.record = MODL(self.size, self.data)
             case b"SPIT": self.record = SPIT(self.size, self.data)
-            case _: print(f"[E] Unknown field record type: {self._type}")
+            case _:
+                if diagnostics is not None:
+                    diagnostics.report("unknown_field_record", self._type, self.size, offset)
 
     def __str__(self, depth=0):
         return "   "*depth + "FieldRecord {\n" + \
@@ -808,6 +1307,8 @@ class FieldRecord:
         return self.__str__()
 
 class ANAM:
+    __slots__ = ("size", "data", "enchantment_points")
+
     def __init__(self, size, data):
         self.size = size
         self.data = data
@@ -821,6 +1322,10 @@ class ANAM:
         return self.__str__()
 
 class DATA:
+    __slots__ = (
+        "size", "data", "type", "speed", "reach", "flags", "value", "health", "weight", "damage"
+    )
+
     def __init__(self, size, data):
         self.size = size
         self.data = data
@@ -852,6 +1357,8 @@ class DATA:
 # Contains the form ID for a magic effect. (MGEF)
 # https://en.uesp.net/wiki/Skyrim_Mod:Mod_File_Format/MGEF
 class EFID:
+    __slots__ = ("size", "data", "form_id")
+
     def __init__(self, size, data):
         self.size = size
         self.data = data
@@ -867,6 +1374,10 @@ class EFID:
 # Contains the effect data for a magic effect.
 # https://en.uesp.net/wiki/Oblivion_Mod:Mod_File_Format/ENCH#EFIT_Subrecord
 class EFIT:
+    __slots__ = (
+        "size", "data", "effect_id", "magnitude", "area", "duration", "_type", "actor_value"
+    )
+
     def __init__(self, size, data):
         self.size = size
         self.data = data
@@ -891,6 +1402,8 @@ class EFIT:
         return self.__str__()
 
 class ENAM:
+    __slots__ = ("size", "data", "enchantment_form_id")
+
     def __init__(self, size, data):
         self.size = size
         self.data = data
@@ -904,6 +1417,8 @@ class ENAM:
         return self.__str__()
 
 class ENIT:
+    __slots__ = ("size", "data", "type", "charge_amount", "enchantment_cost", "flags")
+
     def __init__(self, size, data):
         self.size = size
         self.data = data
@@ -926,11 +1441,13 @@ class ENIT:
 # Full in-game name of an object.
 # The data field contains a null-terminated string.
 class FULL:
+    __slots__ = ("size", "data", "name")
+
     def __init__(self, size, data):
         self.size = size
         self.data = data
 
-        self.name = self.data[:self.size].decode("utf-8")
+        self.name = bytes(self.data[:self.size]).decode("utf-8")
 
     def __str__(self, depth=0):
         return "   "*depth + f"FULL(name: \"{self.name}\"),"
@@ -939,11 +1456,13 @@ class FULL:
         return self.__str__()
     
 class ICON:
+    __slots__ = ("size", "data", "filename")
+
     def __init__(self, size, data):
         self.size = size
         self.data = data
 
-        self.filename = self.data[:self.size].decode("utf-8")
+        self.filename = bytes(self.data[:self.size]).decode("utf-8")
 
     def __str__(self, depth=0):
         return "   "*depth + "ICON {\n" + \
@@ -954,24 +1473,28 @@ class ICON:
         return self.__str__()
 
 class MODB:
+    __slots__ = ("size", "data", "bound_radius")
+
     def __init__(self, size, data):
         self.size = size
         self.data = data
 
-        self.data = int.from_bytes(self.data[:4], "little")
+        self.bound_radius = int.from_bytes(self.data[:4], "little")
 
     def __str__(self, depth=0):
-        return "   "*depth + "MODB(data: {self.data}),"
+        return "   "*depth + f"MODB(bound_radius: {self.bound_radius}),"
       
     def __repr__(self):
         return self.__str__()
 
 class MODL:
+    __slots__ = ("size", "data", "filename")
+
     def __init__(self, size, data):
         self.size = size
         self.data = data
 
-        self.filename = self.data[:self.size].decode("utf-8")
+        self.filename = bytes(self.data[:self.size]).decode("utf-8")
     
     def __str__(self, depth=0):
         return "   "*depth + "MODL {\n" + \
@@ -981,6 +1504,8 @@ class MODL:
         return self.__str__()
 
 class SCIT:
+    __slots__ = ("size", "data", "form_id", "school", "visual_effect", "flags")
+
     def __init__(self, size, data):
         self.size = size
         self.data = data
@@ -1001,6 +1526,8 @@ class SCIT:
         return self.__str__()
 
 class SPIT:
+    __slots__ = ("size", "data", "_type", "spell_cost", "spell_level", "flags")
+
     def __init__(self, size, data):
         self.size = size
         self.data = data
@@ -1,11 +1,24 @@
+import argparse
+import contextlib
+import glob
+import json
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict
 from pprint import pprint
 
 import funcy
 
+from oblivion_catalog import read_save_summary
+from oblivion_json import change_record_to_json, record_schemas, write_ndjson
+from oblivion_profile import LoadProfiler
 from oblivion_save import *
+from oblivion_sqlite import SaveDatabase
 from utils import chunks
 
+DEFAULT_SAVE = "C:\\Users\\Czyzx\\Documents\\My Games\\Oblivion\\Saves\\autosave.ess"
+
 def text_dump(save: OblivionSave):
     pprint(save.file_header)
     pprint(save.save_header)
@@ -63,14 +76,178 @@ def text_dump(save: OblivionSave):
         print(record)
     print("}")
 
+def save_stats(save: OblivionSave):
+    record_headers = save.record_headers
+    name = lambda cr_type: cr_type_names.get(cr_type, str(cr_type))
+
+    return {
+        "records_num": len(save.change_records),
+        "created_num": len(save.globals.created_records),
+        "form_ids_num": len(save.form_ids.ids),
+        "globals_num": len(save.globals.global_vars),
+        "records_by_type": {name(t): count for t, count in record_headers.count_by_type().items()},
+        "bytes_by_type": {name(t): size for t, size in record_headers.bytes_by_type().items()},
+        "diagnostics": save.diagnostics.as_dict(),
+    }
+
+#   Runs one batch job in a worker process.  Errors are returned rather than raised so that one bad
+# save is reported on its own and doesn't abort the run.  With `profile` set the stats and export
+# results include the per-section load profile.
+def batch_job(path, mode, output_dir, profile=False):
+    try:
+        save = None
+
+        match mode:
+            case "summary":
+                result = asdict(read_save_summary(path))
+            case "stats":
+                save = OblivionSave(path, lazy=True, profile=profile)
+                result = save_stats(save)
+            case "export":
+                save = OblivionSave(path, profile=profile)
+                output = os.path.join(output_dir, os.path.basename(path) + ".txt")
+
+                with open(output, "w", encoding="utf-8") as file, contextlib.redirect_stdout(file):
+                    text_dump(save)
+
+                result = {"output": output}
+
+        if profile and save is not None:
+            result["profile"] = save.profiler.as_dict()
+
+        return {"path": path, **result}
+    except Exception as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+
+def expand_paths(patterns):
+    paths = []
+
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        paths.extend(matches if matches else [pattern])
+
+    return paths
+
+#   Parses saves across a process pool and prints one JSON line per save as each one finishes.
+# Workers are recycled every `max_tasks_per_child` saves to bound their memory.
+def batch(args):
+    paths = expand_paths(args.paths)
+    failures = 0
+
+    if args.mode == "export":
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(args.workers, max_tasks_per_child=args.max_tasks_per_child) as executor:
+        futures = {executor.submit(batch_job, path, args.mode, args.output_dir, args.profile): path for path in paths}
+
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"path": futures[future], "error": f"{type(e).__name__}: {e}"}
+
+            failures += "error" in result
+            print(json.dumps(result), flush=True)
+
+    return 1 if failures else 0
+
+#   Dumps one save to stdout or `--output`.  The ndjson format streams the save record by record
+# instead of loading it first.
+def dump(args):
+    with contextlib.ExitStack() as stack:
+        file = sys.stdout
+
+        if args.output:
+            file = stack.enter_context(open(args.output, "w", encoding="utf-8"))
+
+        if args.format == "ndjson":
+            profiler = LoadProfiler() if args.profile else None
+            write_ndjson(args.path, file, args.include_data, profiler=profiler)
+        else:
+            save = OblivionSave(args.path, profile=args.profile)
+            profiler = save.profiler
+
+            with contextlib.redirect_stdout(file):
+                text_dump(save)
+
+    if profiler is not None:
+        print(profiler.report(), file=sys.stderr)
+
+# Adds saves to a SQLite database, one transaction per save.
+def export_sqlite(args):
+    failures = 0
+
+    with SaveDatabase(args.database) as database:
+        for path in expand_paths(args.paths):
+            try:
+                save_id = database.add_save(OblivionSave(path, lazy=True), replace=args.replace)
+                print(json.dumps({"path": path, "save_id": save_id}), flush=True)
+            except Exception as e:
+                failures += 1
+                print(json.dumps({"path": path, "error": f"{type(e).__name__}: {e}"}), flush=True)
+
+    return 1 if failures else 0
+
 def main():
-    save = OblivionSave("C:\\Users\\Czyzx\\Documents\\My Games\\Oblivion\\Saves\\autosave.ess")
+    parser = argparse.ArgumentParser(description="Oblivion save editor")
+    parser.add_argument("--profile", action="store_true", help="report load time, bytes and objects per section")
+    subparsers = parser.add_subparsers(dest="command")
+
+    dump_parser = subparsers.add_parser("dump", help="dump a single save as text or NDJSON")
+    dump_parser.add_argument("path", nargs="?", default=DEFAULT_SAVE)
+    dump_parser.add_argument("--format", choices=["text", "ndjson"], default="text")
+    dump_parser.add_argument("-o", "--output", default=None, help="write to a file instead of stdout")
+    dump_parser.add_argument("--include-data", action="store_true", help="raw change record data, as hex (ndjson)")
+
+    subparsers.add_parser("schema", help="JSON fields of each record class in the ndjson dump")
+
+    record_parser = subparsers.add_parser("record", help="print one change record as JSON, by form ID")
+    record_parser.add_argument("path")
+    record_parser.add_argument("form_id", type=lambda value: int(value, 0), help="e.g. 0x14")
+    record_parser.add_argument("--include-data", action="store_true", help="raw record data, as hex")
+
+    batch_parser = subparsers.add_parser("batch", help="process many saves in parallel")
+    batch_parser.add_argument("paths", nargs="+", help="save files or glob patterns")
+    batch_parser.add_argument("--mode", choices=["summary", "stats", "export"], default="summary")
+    batch_parser.add_argument("--workers", type=int, default=None)
+    batch_parser.add_argument("--max-tasks-per-child", type=int, default=50)
+    batch_parser.add_argument("--output-dir", default="export")
+
+    sqlite_parser = subparsers.add_parser("sqlite", help="export saves to a SQLite database")
+    sqlite_parser.add_argument("database")
+    sqlite_parser.add_argument("paths", nargs="+", help="save files or glob patterns")
+    sqlite_parser.add_argument("--replace", action="store_true", help="re-export saves already in the database")
+
+    args = parser.parse_args()
+
+    match args.command:
+        case "dump":
+            return dump(args)
+        case "schema":
+            print(json.dumps(record_schemas(), indent=2))
+        case "record":
+            record = OblivionSave.read_change_record(args.path, args.form_id)
+
+            if record is None:
+                print(f"No change record with form ID {args.form_id:#010x}", file=sys.stderr)
+                return 1
+
+            print(json.dumps(change_record_to_json(record, args.include_data)))
+        case "batch":
+            return batch(args)
+        case "sqlite":
+            return export_sqlite(args)
+        case _:
+            save = OblivionSave(DEFAULT_SAVE, profile=args.profile)
+
+            if args.profile:
+                print(save.profiler.report())
 
-    # text_dump(save)
+            # text_dump(save)
 
 
-    # breakpoint()
+            # breakpoint()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The modules in osm/ import each other by name, as when run from that directory.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "osm"))
+
+from oblivion_synth import write_synthetic_save
+
+# A synthetic save written for the test, see `oblivion_synth`.
+@pytest.fixture
+def save_path(tmp_path):
+    path = str(tmp_path / "synthetic.ess")
+    write_synthetic_save(path)
+
+    return path
@@ -0,0 +1,36 @@
+import gc
+import zlib
+
+from oblivion_save import OblivionSave
+from oblivion_synth import SynthConfig, write_synthetic_save
+from oblivion_types import COMPRESSED_FLAG, DecompressionCache, decompression_cache
+
+def test_cache_does_not_keep_the_save_mapped(tmp_path):
+    path = str(tmp_path / "compressed.ess")
+    write_synthetic_save(path, SynthConfig(compress_created=True))
+    decompression_cache.clear()
+
+    save = OblivionSave(path)
+    records = [record for record in save.globals.created_records if record.flags & COMPRESSED_FLAG]
+    fields = [len(record.fields) for record in records]
+    del save, records
+    gc.collect()
+
+    assert fields and all(fields)
+    assert all(isinstance(key, bytes) for key in decompression_cache.entries)
+
+    save = OblivionSave(path)
+    hits = decompression_cache.hits
+
+    for record in save.globals.created_records:
+        record.fields
+
+    assert decompression_cache.hits == hits + len(fields)
+
+def test_cache_budget():
+    data = [len(raw).to_bytes(4, "little") + zlib.compress(raw) for raw in (bytes(600), bytes(700))]
+    cache = DecompressionCache(max_bytes=1000)
+
+    assert cache.get(memoryview(data[0])) == bytes(600)
+    assert cache.get(data[1]) == bytes(700)
+    assert len(cache) == 1 and cache.size == 700
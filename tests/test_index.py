@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from oblivion_index import FormIdIndex
+from oblivion_save import OblivionSave
+from oblivion_snapshot import form_id_index_path, read_form_id_index, write_form_id_index
+
+# A decoded record in the middle of the save.
+def sample_record(save):
+    return next(record for record in save.change_records[len(save.change_records)//2:] if record.subrecords)
+
+def same_record(record, expected):
+    return (record.cr_form_id, record.cr_type, record.offset, bytes(record.data)) == \
+           (expected.cr_form_id, expected.cr_type, expected.offset, bytes(expected.data))
+
+#   Rewrites the index of `path` with the offsets changed by `shift(offsets, save size)`, keeping it
+# valid for the save's size and mtime.
+def corrupt_index(path, shift):
+    entries = read_form_id_index(path).entries.copy()
+    entries["offset"] = shift(entries["offset"], os.path.getsize(path))
+    write_form_id_index(path, FormIdIndex(entries))
+
+@pytest.mark.parametrize("backend", ["file", "mmap"])
+def test_read_change_record(save_path, backend):
+    save = OblivionSave(save_path)
+    expected = sample_record(save)
+
+    record = OblivionSave.read_change_record(save_path, expected.cr_form_id, backend=backend)
+
+    assert os.path.exists(form_id_index_path(save_path))
+    assert same_record(record, expected) and record.is_decoded
+    assert OblivionSave.read_change_record(save_path, 0xDEADBEEF, backend=backend) is None
+
+def test_index_is_not_rewritten(save_path):
+    OblivionSave(save_path, form_id_index=True)
+    mtime_ns = os.stat(form_id_index_path(save_path)).st_mtime_ns
+    os.utime(form_id_index_path(save_path), ns=(mtime_ns - 1_000_000_000, mtime_ns - 1_000_000_000))
+    OblivionSave(save_path, form_id_index=True)
+
+    assert os.stat(form_id_index_path(save_path)).st_mtime_ns == mtime_ns - 1_000_000_000
+
+def test_mtime_change_rebuilds(save_path):
+    save = OblivionSave(save_path, form_id_index=True)
+    expected = sample_record(save)
+    corrupt_index(save_path, lambda offsets, size: offsets + 3)
+    stat = os.stat(save_path)
+    os.utime(save_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert read_form_id_index(save_path) is None
+    assert same_record(OblivionSave.read_change_record(save_path, expected.cr_form_id), expected)
+    assert read_form_id_index(save_path) is not None
+
+@pytest.mark.parametrize("backend", ["file", "mmap"])
+@pytest.mark.parametrize("shift", [
+    # Into the middle of each record, at other records, and too close to the end for a header.
+    lambda offsets, size: offsets + 3,
+    lambda offsets, size: offsets[::-1].copy(),
+    lambda offsets, size: offsets*0 + size - 5,
+])
+def test_stale_index_rebuilds(save_path, backend, shift):
+    save = OblivionSave(save_path, form_id_index=True)
+    expected = sample_record(save)
+    corrupt_index(save_path, shift)
+
+    record = OblivionSave.read_change_record(save_path, expected.cr_form_id, backend=backend)
+
+    assert same_record(record, expected) and record.is_decoded
+    assert read_form_id_index(save_path).get(expected.cr_form_id)[0] == expected.offset
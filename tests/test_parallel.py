@@ -0,0 +1,31 @@
+import pytest
+
+from oblivion_save import OblivionSave
+from oblivion_types import same_value
+
+def assert_same_records(records, expected):
+    assert len(records) == len(expected)
+
+    for record, other in zip(records, expected):
+        assert (record.cr_form_id, record.cr_type, record.cr_flags, record.version, record.data_size,
+                record.offset, bytes(record.data)) == \
+               (other.cr_form_id, other.cr_type, other.cr_flags, other.version, other.data_size,
+                other.offset, bytes(other.data))
+        assert [type(subrecord) for subrecord in record.subrecords] == \
+               [type(subrecord) for subrecord in other.subrecords]
+        assert all(same_value(a, b) for a, b in zip(record.subrecords, other.subrecords))
+
+@pytest.mark.parametrize("fingerprints", [False, True])
+def test_parallel_matches_serial(save_path, fingerprints):
+    serial = OblivionSave(save_path, fingerprints=fingerprints)
+    parallel = OblivionSave(save_path, workers=2, fingerprints=fingerprints)
+
+    assert_same_records(parallel.change_records, serial.change_records)
+    assert parallel.diagnostics.as_dict() == serial.diagnostics.as_dict()
+
+    if fingerprints:
+        assert (parallel.record_fingerprints.fingerprints == serial.record_fingerprints.fingerprints).all()
+
+def test_parallel_with_lazy_is_refused(save_path):
+    with pytest.raises(ValueError):
+        OblivionSave(save_path, workers=2, lazy=True)
@@ -0,0 +1,142 @@
+import shutil
+import struct
+
+import pytest
+
+from oblivion_diff import diff_files
+from oblivion_patch import SavePatcher
+from oblivion_save import OblivionSave
+from oblivion_types import cr_type_names
+
+def read_bytes(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+# A decoded record with a field that can be patched, and the name of that field.
+def patchable_record(save, type_name):
+    for record in save.change_records:
+        if cr_type_names.get(record.cr_type) == type_name and record.subrecords:
+            field_offsets = record.subrecords[0].field_offsets
+
+            if field_offsets:
+                return record, next(iter(field_offsets))
+
+    raise LookupError(f"No patchable {type_name} record")
+
+@pytest.mark.parametrize("backend", ["file", "mmap", "memory"])
+def test_round_trip(save_path, tmp_path, backend):
+    output = str(tmp_path / "output.ess")
+    save = OblivionSave(save_path, backend=backend)
+    save.save(output)
+
+    assert read_bytes(output) == read_bytes(save_path)
+
+def test_set_field(save_path, tmp_path):
+    output = str(tmp_path / "output.ess")
+    save = OblivionSave(save_path)
+    record, name = patchable_record(save, "WEAP")
+    value = getattr(record.subrecords[0], name)
+    patcher = SavePatcher(save)
+    patcher.set_field(record, name, value + 2)
+
+    assert patcher.write(output)
+    diff = diff_files(save_path, output)
+
+    assert [change.form_id for change in diff.changed] == [record.cr_form_id]
+    assert diff.changed[0].fields == {f"0.{name}": (value, value + 2)}
+    assert not (diff.added or diff.removed or diff.global_vars)
+
+def test_set_global(save_path, tmp_path):
+    output = str(tmp_path / "output.ess")
+    save = OblivionSave(save_path)
+    patcher = SavePatcher(save)
+    patcher.set_global(0x105, 42)
+
+    assert patcher.write(output)
+    diff = diff_files(save_path, output)
+
+    assert diff.global_vars == {0x105: (5, 42)}
+    assert not diff.changed
+
+def test_replace_data_resized(save_path, tmp_path):
+    output = str(tmp_path / "output.ess")
+    save = OblivionSave(save_path)
+    record = next(record for record in save.change_records if cr_type_names.get(record.cr_type) == "REFR")
+    patcher = SavePatcher(save)
+    patcher.replace_data(record, bytes(record.data) + b"\0\0\0\0")
+
+    assert patcher.needs_rewrite
+    assert not patcher.write(output)
+    diff = diff_files(save_path, output)
+
+    assert [change.form_id for change in diff.changed] == [record.cr_form_id]
+    assert diff.changed[0].header["data_size"] == (record.data_size - 4, record.data_size)
+
+def test_in_place(save_path, tmp_path):
+    original = str(tmp_path / "original.ess")
+    shutil.copyfile(save_path, original)
+    save = OblivionSave(save_path, backend="memory")
+    record, name = patchable_record(save, "BOOK")
+    value = getattr(record.subrecords[0], name)
+    patcher = SavePatcher(save)
+    patcher.set_field(record, name, value ^ 1)
+
+    assert patcher.write(in_place=True)
+    diff = diff_files(original, save_path)
+
+    assert len(read_bytes(save_path)) == len(read_bytes(original))
+    assert diff.changed[0].fields == {f"0.{name}": (value, value ^ 1)}
+
+def test_source_as_filename(save_path):
+    save = OblivionSave(save_path, backend="memory")
+    patcher = SavePatcher(save)
+    patcher.set_global(0x105, 42)
+
+    with pytest.raises(ValueError):
+        patcher.write(save_path)
+
+    assert OblivionSave(save_path).globals.global_vars[0x105] == 5
+
+def test_assigned_field_is_refused(save_path, tmp_path):
+    save = OblivionSave(save_path)
+    record, name = patchable_record(save, "WEAP")
+    setattr(record.subrecords[0], name, getattr(record.subrecords[0], name) + 1)
+
+    with pytest.raises(ValueError):
+        save.save(str(tmp_path / "output.ess"))
+    with pytest.raises(ValueError):
+        SavePatcher(save).write(str(tmp_path / "patched.ess"))
+
+def test_set_field_then_replace_data(save_path, tmp_path):
+    output = str(tmp_path / "output.ess")
+    save = OblivionSave(save_path)
+    #   A field past the start of the data, so that its patch would land after the one for the
+    # whole record.
+    record = next(record for record in save.change_records if cr_type_names.get(record.cr_type) == "WEAP")
+    name, (offset, format) = next(
+        (name, field) for name, field in record.subrecords[0].field_offsets.items() if field[0] > 0
+    )
+    value = getattr(record.subrecords[0], name)
+    patcher = SavePatcher(save)
+    patcher.set_field(record, name, value + 1)
+    data = bytearray(record.data)
+    struct.pack_into(format, data, offset, value + 2)
+    patcher.replace_data(record, bytes(data))
+
+    assert patcher.write(output)
+    diff = diff_files(save_path, output)
+
+    assert diff.changed[0].fields == {f"0.{name}": (value, value + 2)}
+
+def test_save_over_source_is_refused(save_path):
+    save = OblivionSave(save_path)
+
+    with pytest.raises(ValueError):
+        save.save(save_path)
+
+@pytest.mark.parametrize("options", [{"sections": ("globals", "form_ids")}, {"headers_only": True}])
+def test_partial_save_is_refused(save_path, tmp_path, options):
+    save = OblivionSave(save_path, **options)
+
+    with pytest.raises(ValueError):
+        save.save(str(tmp_path / "output.ess"))
@@ -0,0 +1,54 @@
+import struct
+
+import pytest
+
+from oblivion_save import OblivionSave
+from oblivion_save_reader import READER_BACKENDS, OblivionSaveReader
+
+@pytest.mark.parametrize("backend", READER_BACKENDS)
+def test_explicit_offset_moves_position(save_path, backend):
+    with open(save_path, "rb") as file:
+        expected = struct.unpack_from("<I", file.read(24), 20)[0]
+
+    reader = OblivionSaveReader(save_path, backend)
+
+    try:
+        reader.position = 100
+        assert reader.read_u32(20) == expected
+        assert reader.position == 24
+
+        assert bytes(reader.read_bytes(12, 0)) == b"TES4SAVEGAME"
+        assert reader.position == 12
+    finally:
+        reader.close()
+
+@pytest.mark.parametrize("backend", ["file", "mmap"])
+def test_section_offsets_match_full_load(save_path, backend):
+    full = OblivionSave(save_path, backend=backend)
+    reader = OblivionSaveReader(save_path, backend)
+
+    try:
+        assert reader.read_section_offsets() == full.section_offsets
+    finally:
+        reader.close()
+
+    reader = OblivionSaveReader(save_path, backend)
+
+    try:
+        offsets = reader.read_section_offsets(temporary_effects=False)
+    finally:
+        reader.close()
+
+    assert "temporary_effects" not in offsets
+    assert offsets == {name: offset for name, offset in full.section_offsets.items() if name != "temporary_effects"}
+
+@pytest.mark.parametrize("backend", ["file", "mmap"])
+def test_load_sections_matches_full_load(save_path, backend):
+    full = OblivionSave(save_path, backend=backend)
+    save = OblivionSave(save_path, backend=backend, sections=("globals", "temporary_effects", "form_ids"))
+
+    assert save.plugins is None and save.change_records is None and save.worldspaces is None
+    assert save.globals.records_num == full.globals.records_num
+    assert dict(save.globals.global_vars) == dict(full.globals.global_vars)
+    assert bytes(save.temporary_effects.data) == bytes(full.temporary_effects.data)
+    assert (save.form_ids.ids == full.form_ids.ids).all()
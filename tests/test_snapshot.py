@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from oblivion_index import ChangeRecordSequence
+from oblivion_save import OblivionSave
+from oblivion_snapshot import snapshot_path
+from oblivion_synth import SynthConfig, write_synthetic_save
+
+# Loads `path` with a snapshot and returns the save and whether it was loaded from the snapshot.
+def load(path, **options):
+    save = OblivionSave(path, snapshot=True, **options)
+
+    return save, isinstance(save.change_records, ChangeRecordSequence)
+
+def headers(save):
+    return [
+        (record.cr_form_id, record.cr_type, record.cr_flags, record.version, record.data_size, record.offset,
+         bytes(record.data))
+        for record in save.change_records
+    ]
+
+def test_reload_from_snapshot(save_path):
+    full, from_snapshot = load(save_path)
+
+    assert not from_snapshot
+    assert os.path.exists(snapshot_path(save_path))
+
+    for lazy in (False, True):
+        save, from_snapshot = load(save_path, lazy=lazy)
+
+        assert from_snapshot
+        assert headers(save) == headers(full)
+        assert save.section_offsets == full.section_offsets
+        assert save.diagnostics.as_dict() == full.diagnostics.as_dict()
+        assert save.globals.records_num == full.globals.records_num
+
+def test_mtime_change_invalidates(save_path):
+    load(save_path)
+    stat = os.stat(save_path)
+    os.utime(save_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert not load(save_path)[1]
+    assert load(save_path)[1]
+
+def test_content_change_invalidates(save_path):
+    full, _ = load(save_path)
+    stat = os.stat(save_path)
+
+    # A byte of the screenshot pixels, which changes neither the size nor the layout.
+    with open(save_path, "r+b") as file:
+        file.seek(full.section_offsets["save_header.screenshot"] + 16)
+        value = file.read(1)[0]
+        file.seek(-1, os.SEEK_CUR)
+        file.write(bytes([value ^ 0xFF]))
+
+    os.utime(save_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    save, from_snapshot = load(save_path)
+
+    assert not from_snapshot
+    assert headers(save) == headers(full)
+
+def test_size_change_invalidates(save_path):
+    load(save_path)
+    stat = os.stat(save_path)
+    write_synthetic_save(save_path, SynthConfig(records_num=500, seed=1))
+    os.utime(save_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert os.stat(save_path).st_size != stat.st_size
+    save, from_snapshot = load(save_path)
+
+    assert not from_snapshot
+    assert len(save.change_records) == 500
+
+@pytest.mark.parametrize("options", [{"fingerprints": True}, {"sections": ("globals",)}, {"backend": "file"}])
+def test_incompatible_options(save_path, options):
+    with pytest.raises(ValueError):
+        OblivionSave(save_path, snapshot=True, **options)